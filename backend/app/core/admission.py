@@ -0,0 +1,248 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+from app.core.config import get_settings
+from app.core.chunking import estimate_tokens
+from app.core.metrics import LLM_SECONDS, LLM_TOKENS
+from app.core.tracing import tracer
+
+# Interactive chat is always admitted ahead of background work (extraction, learner jobs)
+PRIORITIES = ("interactive", "background")
+
+# Caller identity for fair scheduling; set per chat request, inherited by graph node tasks
+llm_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_session", default=None)
+# Overrides the model's priority; set to "background" by the job queue workers
+llm_priority: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_priority", default=None)
+
+# Minute window used for the RPM/TPM limits
+RATE_WINDOW_SECONDS = 60.0
+
+class Overloaded(Exception):
+    """The LLM admission queue is full."""
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "started")
+
+    def __init__(self, future: asyncio.Future, tokens: int, started: float):
+        self.future = future
+        self.tokens = tokens
+        self.started = started
+
+class AdmissionController:
+    """Process-wide gate in front of every LLM call.
+
+    Enforces a concurrency limit and requests/tokens-per-minute limits. Waiting
+    calls are queued per priority and, within a priority, per session; sessions
+    take turns (round robin) so one chatty session or a bulk job cannot starve
+    the others. When `max_queue` calls are already waiting, new calls fail fast
+    with Overloaded instead of piling up.
+    """
+
+    def __init__(self, max_concurrency: int = 8, rpm: int = 0, tpm: int = 0, max_queue: int = 100):
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm  # 0 = unlimited
+        self.tpm = tpm  # 0 = unlimited
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._requests: Deque[float] = deque()  # Admission times within the rate window
+        self._tokens: Deque[Tuple[float, int]] = deque()  # (timestamp, tokens) within the rate window
+        self._window_tokens = 0
+        self._wake_handle: Optional[asyncio.TimerHandle] = None
+        self.admitted = 0
+        self.rejected = 0
+        self._waits: Deque[float] = deque(maxlen=1000)
+
+    # --- Public API ---
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0, session_id: Optional[str] = None, priority: Optional[str] = None):
+        """Hold an LLM slot for the duration of the block."""
+        await self.acquire(tokens, session_id, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, tokens: int = 0, session_id: Optional[str] = None, priority: Optional[str] = None):
+        priority = priority if priority in PRIORITIES else "interactive"
+        session_id = session_id or "-"
+        started = time.monotonic()
+        if not self._waiting_count() and self._can_admit(tokens):
+            self._admit(tokens, started)
+            return
+        if self._waiting_count() >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("The assistant is handling too many requests right now. Please try again in a moment.")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(session_id, deque()).append(_Waiter(future, tokens, started))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up; hand the slot back
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def record_tokens(self, tokens: int):
+        """Count tokens that were not known at admission (e.g. the model's output)."""
+        if tokens > 0:
+            self._tokens.append((time.monotonic(), tokens))
+            self._window_tokens += tokens
+
+    def would_queue(self) -> bool:
+        """True if a new call would have to wait (or be rejected)."""
+        return self._waiting_count() > 0 or not self._can_admit(0)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+        return {
+            "in_flight": self.in_flight,
+            "queued": {p: sum(self._live(q) for q in self._queues[p].values()) for p in PRIORITIES},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds": {"p50": pct(0.5), "p95": pct(0.95), "max": waits[-1] if waits else 0.0},
+            "window": {"requests": len(self._requests), "tokens": self._window_tokens},
+        }
+
+    # --- Scheduling ---
+
+    @staticmethod
+    def _live(queue: Deque[_Waiter]) -> int:
+        return sum(1 for waiter in queue if not waiter.future.done())
+
+    def _waiting_count(self) -> int:
+        return sum(self._live(q) for queues in self._queues.values() for q in queues.values())
+
+    def _expire_window(self, now: float):
+        while self._requests and now - self._requests[0] >= RATE_WINDOW_SECONDS:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= RATE_WINDOW_SECONDS:
+            self._window_tokens -= self._tokens.popleft()[1]
+
+    def _can_admit(self, tokens: int) -> bool:
+        return self._retry_after(tokens) == 0.0
+
+    def _retry_after(self, tokens: int) -> float:
+        """Seconds until a call of `tokens` fits the limits (0 if it fits now)."""
+        if self.in_flight >= self.max_concurrency:
+            return float("inf")  # Woken by release()
+        now = time.monotonic()
+        self._expire_window(now)
+        wait = 0.0
+        if self.rpm and len(self._requests) >= self.rpm:
+            wait = self._requests[len(self._requests) - self.rpm] + RATE_WINDOW_SECONDS - now
+        if self.tpm and self._window_tokens + tokens > self.tpm and self._tokens:
+            # Wait until enough old entries leave the window
+            excess = self._window_tokens + tokens - self.tpm
+            for timestamp, spent in self._tokens:
+                excess -= spent
+                if excess <= 0:
+                    wait = max(wait, timestamp + RATE_WINDOW_SECONDS - now)
+                    break
+        return max(wait, 0.0)
+
+    def _admit(self, tokens: int, started: float):
+        self.in_flight += 1
+        self.admitted += 1
+        self._requests.append(time.monotonic())
+        self.record_tokens(tokens)
+        self._waits.append(time.monotonic() - started)
+
+    def _next_waiter(self) -> Optional[Tuple[str, str, _Waiter]]:
+        """Head waiter of the next session in turn, highest priority first."""
+        for priority in PRIORITIES:
+            sessions = self._queues[priority]
+            while sessions:
+                session_id, queue = next(iter(sessions.items()))
+                while queue and queue[0].future.done():
+                    queue.popleft()  # Cancelled while waiting
+                if queue:
+                    return priority, session_id, queue[0]
+                del sessions[session_id]
+        return None
+
+    def _dispatch(self):
+        while True:
+            head = self._next_waiter()
+            if head is None:
+                return
+            priority, session_id, waiter = head
+            retry_after = self._retry_after(waiter.tokens)
+            if retry_after:
+                if retry_after != float("inf"):
+                    self._schedule_wake(retry_after)
+                return
+            sessions = self._queues[priority]
+            queue = sessions.pop(session_id)
+            queue.popleft()
+            if queue:
+                sessions[session_id] = queue  # Back of the line: next session's turn
+            self._admit(waiter.tokens, waiter.started)
+            waiter.future.set_result(None)
+
+    def _schedule_wake(self, delay: float):
+        if self._wake_handle is not None:
+            self._wake_handle.cancel()
+        self._wake_handle = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+class AdmittedModel:
+    """Chat model wrapper that takes an admission slot around `ainvoke`.
+
+    Only `ainvoke` is admitted: it is the one call the agent nodes and the
+    extractor make (chat tokens are streamed from it through LangGraph's
+    callbacks). Everything else (attributes, sync calls, `astream`, `bind`)
+    is delegated to the wrapped model ungated.
+    """
+
+    def __init__(self, model, controller: AdmissionController, priority: str = "interactive", profile: str = "default"):
+        self.model = model
+        self.controller = controller
+        self.priority = priority
+        self.profile = profile
+        self._latency = LLM_SECONDS.labels(profile)
+        self._input_tokens = LLM_TOKENS.labels(profile, "input")
+        self._output_tokens = LLM_TOKENS.labels(profile, "output")
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        tokens = estimate_tokens(input if isinstance(input, str) else str(input))
+        with tracer.span(f"llm.{self.profile}", "llm", prompt_tokens=tokens, prompt_chars=len(str(input))) as span:
+            queued_at = time.perf_counter()
+            async with self.controller.slot(tokens, llm_session.get(), llm_priority.get() or self.priority):
+                started = time.perf_counter()
+                response = await self.model.ainvoke(input, config, **kwargs)
+                self._latency.observe(time.perf_counter() - started)
+            usage = getattr(response, "usage_metadata", None) or {}
+            output_tokens = usage.get("output_tokens") or estimate_tokens(str(getattr(response, "content", "")))
+            if span is not None:
+                span.attrs.update(queue_seconds=started - queued_at, output_tokens=output_tokens)
+        self.controller.record_tokens(output_tokens)
+        self._input_tokens.inc(usage.get("input_tokens") or tokens)
+        self._output_tokens.inc(output_tokens)
+        return response
+
+def _build_controller() -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        rpm=settings.LLM_RPM,
+        tpm=settings.LLM_TPM,
+        max_queue=settings.LLM_MAX_QUEUE
+    )
+
+# Global instance
+llm_admission = _build_controller()
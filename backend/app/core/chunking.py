@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Tuple
+
+# Rough characters-per-token ratio for English text and code
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def chunk_spans(text: str, max_tokens: int) -> List[Tuple[int, int]]:
+    """Split text into (start, end) spans of at most max_tokens.
+
+    Cuts prefer a blank line, then a line break, then a space in the second
+    half of the window, so statements and Impex blocks usually stay whole.
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    spans = []
+    start, length = 0, len(text)
+    while start < length:
+        end = min(start + max_chars, length)
+        if end < length:
+            window = text[start:end]
+            for separator in ("\n\n", "\n", " "):
+                cut = window.rfind(separator, max_chars // 2)
+                if cut != -1:
+                    end = start + cut + len(separator)
+                    break
+        if text[start:end].strip():
+            spans.append((start, end))
+        start = end
+    return spans
+
+def chunk_records(text: str, max_tokens: int) -> List[Dict[str, int]]:
+    """Chunk boundaries as stored on a KB document (Firestore has no nested arrays)."""
+    return [{"start": start, "end": end} for start, end in chunk_spans(text, max_tokens)]
+
+def document_chunks(doc: Dict[str, Any], max_tokens: int) -> List[str]:
+    """Chunk texts of a document, from its stored boundaries when they match its content."""
+    content = doc.get("content") or ""
+    records = doc.get("chunks")
+    if records and all(isinstance(r, dict) and 0 <= r.get("start", -1) < r.get("end", -1) <= len(content) for r in records):
+        return [content[r["start"]:r["end"]] for r in records]
+    return [content[start:end] for start, end in chunk_spans(content, max_tokens)]
@@ -1,3 +1,4 @@
+import os
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 from typing import Optional
@@ -8,9 +9,85 @@ class Settings(BaseSettings):
     API_PREFIX: str = "/api"
     
     # Google Gemini & Firebase
-    GEMINI_API_KEY: str
+    GEMINI_API_KEY: str = ""  # Empty = not configured (LLM features are unavailable, import still works)
     FIREBASE_SERVICE_ACCOUNT_PATH: str = "service_account.json"
     FIREBASE_CREDENTIALS_JSON: Optional[str] = None
+
+    # LLM models (see app/core/llm.py for the per-profile configuration)
+    LLM_MODEL: str = "gemini-2.0-flash"
+    EXTRACTOR_MODEL: str = "gemini-2.0-flash"
+    LLM_MAX_RETRIES: int = 2
+
+    # LLM admission control (see app/core/admission.py)
+    LLM_MAX_CONCURRENCY: int = 8  # Gemini calls in flight per process
+    LLM_RPM: int = 0  # Requests per minute (0 = unlimited)
+    LLM_TPM: int = 0  # Estimated tokens per minute (0 = unlimited)
+    LLM_MAX_QUEUE: int = 100  # Waiting calls beyond this are rejected as overloaded
+
+    # KB index cache
+    KB_INDEX_LISTENER: bool = True  # Keep the cached index live via a Firestore snapshot listener
+    KB_INDEX_LISTENER_TIMEOUT: float = 10.0  # Seconds to wait for the first snapshot before polling
+    KB_INDEX_POLL_SECONDS: int = 60  # Refresh interval when the listener is unavailable
+    FIRESTORE_MAX_WORKERS: int = 8  # Thread pool for the async wrappers around blocking Firestore calls
+    DOC_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # Full-document LRU cache budget (0 disables)
+
+    # Retrieval
+    RETRIEVAL_CANDIDATE_LIMIT: int = 30  # Max KB entries (BM25 shortlist) rendered into the retrieval prompt
+    RETRIEVAL_STRATEGY: str = "llm"  # "llm" (BM25 shortlist + Gemini selection) or "vector" (embeddings only)
+    RETRIEVAL_TOP_K: int = 5
+    CHUNK_TOKENS: int = 300  # Documents are split into chunks of about this many tokens when written
+    CONTEXT_TOKEN_BUDGET: int = 3000  # Max KB context tokens packed into the generation prompt
+
+    # Vector retrieval
+    EMBEDDING_BACKEND: str = "gemini"  # "gemini" or "hashing" (deterministic, offline)
+    EMBEDDING_MODEL: str = "models/text-embedding-004"
+    EMBED_BATCH_SIZE: int = 100  # Documents per embedding call (the Gemini batch limit)
+    VECTOR_INDEX_PATH: str = ""  # e.g. "data/kb_vectors"; empty keeps the index in memory only
+    VECTOR_INDEX_SAVE_SECONDS: int = 30
+    VECTOR_MIN_SCORE: float = 0.5  # Cosine similarity below this is treated as not relevant
+
+    # Answer cache (technical questions)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 512
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_SIMILARITY: float = 0.0  # > 0 enables near-duplicate matching by embedding cosine similarity
+
+    # Conversation checkpoints (see app/services/agent/checkpoint.py)
+    CHECKPOINT_BACKEND: str = "sqlite"  # "sqlite" (WAL, shared by workers on one host) or "redis" (shared store)
+    CHECKPOINT_SQLITE_PATH: str = "data/checkpoints.sqlite"  # Relative paths are resolved against backend/
+    CHECKPOINT_REDIS_URL: str = ""  # Empty uses an in-process stand-in for the redis backend
+    SESSION_TTL_SECONDS: int = 300  # Inactive sessions are expired after this long
+    SESSION_MAX_LIVE: int = 1000  # Least recently used sessions are evicted beyond this (0 = unlimited)
+    SESSION_MAX_STATE_BYTES: int = 256 * 1024 * 1024  # Approximate cap on conversation state held (0 = unlimited)
+    CHECKPOINT_KEEP_LATEST: int = 3  # Checkpoints kept per thread (0 = full history)
+
+    # KB listing
+    KB_PAGE_SIZE: int = 50  # Default page size for GET /api/kb?limit=...
+    KB_MAX_PAGE_SIZE: int = 500
+
+    # Bulk KB import/export
+    KB_EXPORT_PAGE_SIZE: int = 500  # Documents read per Firestore query while exporting
+    KB_IMPORT_BATCH_SIZE: int = 500  # Documents per Firestore batched write (max 500)
+
+    # Bulk extraction
+    EXTRACT_BATCH_CONCURRENCY: int = 8  # Max extractions in flight per /api/extract/batch request
+
+    # Background jobs (learner persistence)
+    JOB_WORKERS: int = 2
+    JOB_HISTORY: int = 1000  # Finished jobs kept for status polling
+
+    # Conversation compaction
+    MESSAGE_WINDOW: int = 8  # Messages kept verbatim in state; older ones are folded into the summary
+    SUMMARY_LINE_CHARS: int = 200  # Max characters kept per folded message
+    SUMMARY_MAX_CHARS: int = 2000  # Rolling summary budget; oldest lines are dropped beyond it
+
+    # Startup
+    WARMUP_ON_STARTUP: bool = True  # Build Firestore/LLM clients and the graph before /ready reports ready
+
+    # Request tracing (see app/core/tracing.py)
+    TRACE_SAMPLE_RATE: float = 1.0  # Fraction of chat requests traced; lower it under heavy load
+    TRACE_BUFFER_SIZE: int = 200  # Most recent traces kept in memory
+    TRACE_EXPORT_PATH: str = ""  # Append finished traces to this JSONL file ("" = off)
     
     class Config:
         env_file = ".env"
@@ -19,3 +96,10 @@ class Settings(BaseSettings):
 @lru_cache()
 def get_settings():
     return Settings()
+
+# backend/, so relative data paths do not depend on the working directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def resolve_path(path: str) -> str:
+    """Resolve a path setting; relative paths are taken from the backend directory."""
+    return path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+def doc_size(data: Dict[str, Any]) -> int:
+    """Approximate in-memory size of a document: the length of its keys and values as text."""
+    size = 0
+    for key, value in data.items():
+        size += len(key)
+        if isinstance(value, (list, tuple)):
+            size += sum(len(str(item)) for item in value)
+        else:
+            size += len(str(value))
+    return size
+
+class DocumentCache:
+    """LRU cache of full KB documents, bounded by total (approximate) bytes.
+
+    A few canonical snippets are cited in most answers, so a small budget
+    avoids most repeated Firestore reads. Documents larger than the whole
+    budget are never cached.
+
+    `generation` changes on every invalidation or authoritative put. A caller
+    filling the cache from a read passes the generation it saw before reading,
+    so a read that raced with a write cannot put the stale document back.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self.bytes = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_many(self, doc_ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Split doc_ids into cached documents (copies) and IDs that must be read."""
+        found, missing = {}, []
+        with self._lock:
+            for doc_id in doc_ids:
+                entry = self._entries.get(doc_id)
+                if entry is None:
+                    missing.append(doc_id)
+                    continue
+                self._entries.move_to_end(doc_id)
+                found[doc_id] = dict(entry[0])
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put(self, doc_id: str, data: Dict[str, Any], generation: Optional[int] = None):
+        """Cache a document. With `generation`, skipped if the cache changed since then."""
+        if not self.enabled:
+            return
+        size = doc_size(data)
+        with self._lock:
+            if generation is None:
+                self.generation += 1
+            elif generation != self.generation:
+                return
+            self._pop(doc_id)
+            if size > self.max_bytes:
+                return
+            self._entries[doc_id] = (dict(data), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, doc_id: str):
+        with self._lock:
+            self.generation += 1
+            self._pop(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def on_kb_change(self, event: str, doc_id: Optional[str], data: Optional[Dict[str, Any]]):
+        """FirebaseClient listener hook: refresh cached documents from full upserts, drop them otherwise."""
+        if event == "upsert":
+            with self._lock:
+                cached = doc_id in self._entries
+            if cached:
+                self.put(doc_id, {**data, "id": doc_id})
+        elif event in ("update", "delete"):
+            self.invalidate(doc_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _pop(self, doc_id: str):
+        entry = self._entries.pop(doc_id, None)
+        if entry is not None:
+            self.bytes -= entry[1]
@@ -1,97 +1,522 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
-from typing import List, Dict, Any, Optional
+import asyncio
+import contextvars
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
 from app.core.config import get_settings
+from app.core.doc_cache import DocumentCache
+from app.core.chunking import chunk_records
+from app.core.singleflight import single_flight
+from app.core.metrics import FIRESTORE_SECONDS, count_documents, timed
+from app.core.tracing import tracer, traced
+
+# Firestore allows at most 500 writes per batch
+BATCH_WRITE_LIMIT = 500
+
+# Fields kept in the in-process KB index (everything except the full content)
+INDEX_FIELDS = {
+    "title": "Untitled",
+    "tags": [],
+    "summary": "",
+    "status": "verified",
+    "ai_created": False,
+}
+
+def _index_entry(doc_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an index entry from a full Firestore document."""
+    entry = {"id": doc_id}
+    for field, default in INDEX_FIELDS.items():
+        entry[field] = data.get(field, default)
+    return entry
+
+def _fingerprint(data: Dict[str, Any]) -> str:
+    """Content hash of a document, to tell which documents a poll actually changed."""
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _with_chunks(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach chunk boundaries for the document's content (computed at write time)."""
+    if "content" not in data:
+        return data
+    return {**data, "chunks": chunk_records(data.get("content") or "", get_settings().CHUNK_TOKENS)}
+
+def _observed(method: str) -> Callable:
+    """Latency metric plus a trace span for a FirebaseClient operation."""
+    def decorator(fn):
+        return timed(FIRESTORE_SECONDS, method)(traced(f"firestore.{method}", "firestore")(fn))
+    return decorator
+
+def _count_documents(op: str, count: int = 1):
+    count_documents(op, count)
+    tracer.add(f"documents_{op}", count)
 
 class FirebaseClient:
     def __init__(self):
         settings = get_settings()
-        # Check if initialized
-    def __init__(self):
+
+        # Cached KB index (doc_id -> index entry), loaded once and kept live
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._index_loaded = False
+        self._index_lock = threading.RLock()
+        self._index_init_lock = threading.Lock()
+        self._index_watch = None
+        self._index_poller: Optional[threading.Thread] = None
+        # doc_id -> content fingerprint, so polls only report real changes
+        self._index_fingerprints: Dict[str, str] = {}
+        self.kb_version = 0
+        self.kb_modified_at = time.time()
+        # Distinguishes this process's kb_version from other workers' (for ETags)
+        self.instance_id = uuid.uuid4().hex[:8]
+        # Change listeners: callback(event, doc_id, data), see subscribe()
+        self._listeners: List[Callable[[str, Optional[str], Optional[Dict[str, Any]]], None]] = []
+        # Full documents for fetch_documents, kept fresh by write-through and change events
+        self.doc_cache = DocumentCache(settings.DOC_CACHE_MAX_BYTES)
+        self._listeners.append(self.doc_cache.on_kb_change)
+        # Bounded pool for blocking Firestore calls made from async code
+        self._executor = ThreadPoolExecutor(max_workers=settings.FIRESTORE_MAX_WORKERS, thread_name_prefix="firestore")
+
+        # Firestore connection, made on first use (see connect())
+        self.collection_name = "knowledge_base"
+        self._db = None
+        self._connected = False
+        self._connect_lock = threading.Lock()
+
+    # --- Connection ---
+
+    @property
+    def db(self):
+        """Firestore client, connected on first use; None if Firebase is not configured."""
+        if not self._connected:
+            self.connect()
+        return self._db
+
+    @db.setter
+    def db(self, client):
+        """Install a Firestore client directly (e.g. for the emulator or an in-memory stand-in)."""
+        with self._connect_lock:
+            self._db = client
+            self._connected = True
+
+    def connect(self) -> bool:
+        """Initialize Firebase and the Firestore client once. Returns whether a client is available.
+
+        Kept out of import time: loading credentials and the Firestore SDK is slow,
+        and a misconfigured credential should fail warm-up, not every import.
+        """
+        if not self._connected:
+            with self._connect_lock:
+                if not self._connected:
+                    self._db = self._create_client()
+                    self._connected = True
+        return self._db is not None
+
+    def _create_client(self):
+        import firebase_admin
+        from firebase_admin import credentials, firestore
         settings = get_settings()
+
         # Check if initialized
         if not firebase_admin._apps:
             try:
                 # 1. Try loading from JSON string (Env Var)
                 if settings.FIREBASE_CREDENTIALS_JSON:
-                    import json
                     cred_dict = json.loads(settings.FIREBASE_CREDENTIALS_JSON)
                     cred = credentials.Certificate(cred_dict)
                     firebase_admin.initialize_app(cred)
                     print("Firebase initialized with credentials from Environment Variable.")
-                
+
                 # 2. Try loading from File Path
                 elif os.path.exists(settings.FIREBASE_SERVICE_ACCOUNT_PATH):
                     cred = credentials.Certificate(settings.FIREBASE_SERVICE_ACCOUNT_PATH)
                     firebase_admin.initialize_app(cred)
                     print(f"Firebase initialized with {settings.FIREBASE_SERVICE_ACCOUNT_PATH}")
-                
+
                 else:
                     print(f"Warning: neither FIREBASE_CREDENTIALS_JSON env var nor {settings.FIREBASE_SERVICE_ACCOUNT_PATH} found. Firebase not initialized.")
-                    self.db = None
-                    return
+                    return None
             except Exception as e:
                 print(f"Error initializing Firebase: {e}")
-                self.db = None
-                return
+                return None
 
         try:
-            self.db = firestore.client()
-            self.collection_name = "knowledge_base"
+            return firestore.client()
         except Exception as e:
             print(f"Error getting Firestore client: {e}")
-            self.db = None
+            return None
+
+    def close(self):
+        """Detach the index listener and release the Firestore thread pool (on shutdown)."""
+        if self._index_watch is not None:
+            self._index_watch.unsubscribe()
+            self._index_watch = None
+        self._executor.shutdown(wait=False)
+
+    # --- KB index cache ---
+
+    def _ensure_index(self):
+        """Load the index once and keep it current via a listener or poller."""
+        if self._index_loaded:
+            return
+        with self._index_init_lock:
+            if self._index_loaded:
+                return
+            if get_settings().KB_INDEX_LISTENER and self._start_index_listener():
+                return
+            self._load_index()
+            self._start_index_poller()
+
+    @_observed("load_index")
+    def _load_index(self):
+        """Read the whole collection into the cached index.
+
+        The first load is announced as a full reload ("reset" ... "synced"). Later
+        polls notify listeners, and bump kb_version, only for documents that changed.
+        """
+        initial = not self._index_loaded
+        with self._index_lock:
+            previous = dict(self._index_fingerprints)
+        if initial:
+            self._notify("reset", None, None)
+        seen = set()
+        changed = 0
+        for doc in self.db.collection(self.collection_name).stream():
+            data = doc.to_dict()
+            fingerprint = _fingerprint(data)
+            seen.add(doc.id)
+            if previous.get(doc.id) == fingerprint:
+                continue
+            with self._index_lock:
+                self._index[doc.id] = _index_entry(doc.id, data)
+                self._index_fingerprints[doc.id] = fingerprint
+            self._notify("upsert", doc.id, data)
+            changed += 1
+        _count_documents("read", len(seen))
+        removed = [doc_id for doc_id in previous if doc_id not in seen]
+        with self._index_lock:
+            for doc_id in removed:
+                self._index.pop(doc_id, None)
+                self._index_fingerprints.pop(doc_id, None)
+            self._index_loaded = True
+            if initial or changed or removed:
+                self.kb_version += 1
+                self.kb_modified_at = time.time()
+        for doc_id in removed:
+            self._notify("delete", doc_id, None)
+        if initial:
+            self._notify("synced", None, None)
+
+    def _start_index_listener(self) -> bool:
+        """Attach a snapshot listener. Returns False if no snapshot arrives in time."""
+        first_snapshot = threading.Event()
+
+        def on_snapshot(col_snapshot, changes, read_time):
+            # The first snapshot carries the whole collection
+            initial = not first_snapshot.is_set()
+            events = [("reset", None, None)] if initial else []
+            with self._index_lock:
+                for change in changes:
+                    doc = change.document
+                    if change.type.name == "REMOVED":
+                        self._index.pop(doc.id, None)
+                        events.append(("delete", doc.id, None))
+                    else:
+                        data = doc.to_dict()
+                        self._index[doc.id] = _index_entry(doc.id, data)
+                        events.append(("upsert", doc.id, data))
+                self._index_loaded = True
+                self.kb_version += 1
+                self.kb_modified_at = time.time()
+            _count_documents("read", len(changes))
+            if initial:
+                events.append(("synced", None, None))
+            for event in events:
+                self._notify(*event)
+            first_snapshot.set()
+
+        try:
+            self._index_watch = self.db.collection(self.collection_name).on_snapshot(on_snapshot)
+        except Exception as e:
+            print(f"KB index listener unavailable, falling back to polling: {e}")
+            return False
+
+        if not first_snapshot.wait(timeout=get_settings().KB_INDEX_LISTENER_TIMEOUT):
+            print("KB index listener timed out, falling back to polling.")
+            self._index_watch.unsubscribe()
+            self._index_watch = None
+            return False
+        print("KB index loaded and listening for changes.")
+        return True
+
+    def _start_index_poller(self):
+        interval = get_settings().KB_INDEX_POLL_SECONDS
+        if self._index_poller or interval <= 0:
+            return
 
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    self._load_index()
+                except Exception as e:
+                    print(f"KB index refresh error: {e}")
+
+        self._index_poller = threading.Thread(target=poll, name="kb-index-poller", daemon=True)
+        self._index_poller.start()
+
+    def _update_index(self, doc_id: str, data: Optional[Dict[str, Any]], merge: bool = False):
+        """Write-through for local changes. data=None removes the entry."""
+        with self._index_lock:
+            if not self._index_loaded:
+                return
+            if data is None:
+                self._index.pop(doc_id, None)
+                self._index_fingerprints.pop(doc_id, None)
+                event = "delete"
+            elif merge:
+                if doc_id in self._index:
+                    entry = dict(self._index[doc_id])
+                    entry.update({k: v for k, v in data.items() if k in INDEX_FIELDS})
+                    self._index[doc_id] = entry
+                # The merged document is unknown here; the next poll re-reads it in full
+                self._index_fingerprints.pop(doc_id, None)
+                event = "update"
+            else:
+                self._index[doc_id] = _index_entry(doc_id, data)
+                self._index_fingerprints[doc_id] = _fingerprint(data)
+                event = "upsert"
+            self.kb_version += 1
+            self.kb_modified_at = time.time()
+        self._notify(event, doc_id, data)
+
+    # --- Change listeners ---
+
+    def subscribe(self, callback: Callable[[str, Optional[str], Optional[Dict[str, Any]]], None]):
+        """Register a listener for KB changes.
+
+        Events: "reset" (full reload follows), "upsert" (full document), "update"
+        (partial fields), "delete" and "synced" (full reload finished). If the index
+        is already loaded, the current documents are replayed to the new listener.
+        """
+        self._listeners.append(callback)
+        if self._index_loaded and self.db:
+            callback("reset", None, None)
+            replayed = 0
+            for doc in self.db.collection(self.collection_name).stream():
+                callback("upsert", doc.id, doc.to_dict())
+                replayed += 1
+            _count_documents("read", replayed)
+            callback("synced", None, None)
+
+    def _notify(self, event: str, doc_id: Optional[str], data: Optional[Dict[str, Any]]):
+        for callback in self._listeners:
+            try:
+                callback(event, doc_id, data)
+            except Exception as e:
+                print(f"KB listener error ({event} {doc_id}): {e}")
+
+    # --- KB access ---
+
+    @_observed("fetch_index")
     def fetch_index(self) -> List[Dict[str, Any]]:
-        """Fetches ID, title, tags, and summary for all documents to aid matching."""
+        """Returns ID, title, tags, and summary for all documents to aid matching (cached)."""
         if not self.db: return []
-        docs = self.db.collection(self.collection_name).stream()
-        index = []
-        for doc in docs:
+        self._ensure_index()
+        with self._index_lock:
+            return [dict(entry) for entry in self._index.values()]
+
+    @_observed("kb_change_marker")
+    def kb_change_marker(self) -> Tuple[str, float]:
+        """(tag, modified_at) identifying the current KB state, for conditional responses."""
+        if self.db:
+            self._ensure_index()
+        return f"{self.instance_id}-{self.kb_version}", self.kb_modified_at
+
+    @_observed("query_documents")
+    def query_documents(
+        self,
+        filters: Optional[List[Tuple[str, str, Any]]] = None,
+        fields: Optional[List[str]] = None,
+        start_after: Optional[str] = None,
+        limit: int = 50
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of documents in ID order, filtered and projected in Firestore.
+
+        Returns (docs, next_cursor); next_cursor is None on the last page.
+        """
+        if not self.db: return [], None
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        collection = self.db.collection(self.collection_name)
+        query = collection
+        for field, op, value in filters or []:
+            query = query.where(filter=FieldFilter(field, op, value))
+        if fields:
+            query = query.select(fields)
+        query = query.order_by("__name__")
+        if start_after:
+            query = query.start_after({"__name__": collection.document(start_after)})
+        # One extra document tells whether another page exists
+        docs = []
+        for doc in query.limit(limit + 1).stream():
             data = doc.to_dict()
-            index.append({
-                "id": doc.id,
-                "title": data.get("title", "Untitled"),
-                "tags": data.get("tags", []),
-                "summary": data.get("summary", ""),
-                "status": data.get("status", "verified"),
-                "ai_created": data.get("ai_created", False)
-            })
-        return index
+            data['id'] = doc.id
+            docs.append(data)
+        _count_documents("read", len(docs))
+        if len(docs) > limit:
+            return docs[:limit], docs[limit - 1]['id']
+        return docs, None
 
+    @_observed("fetch_documents")
     def fetch_documents(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
-        """Fetches full content for specific document IDs."""
+        """Fetches full content for specific document IDs in one batched read, keeping input order."""
+        if not self.db: return []
+
+        # De-duplicate, and skip IDs the index knows are missing. Only a snapshot
+        # listener keeps the index current; a polled one may not have seen new documents yet.
+        with self._index_lock:
+            known = self._index if self._index_loaded and self._index_watch is not None else None
+            wanted = [doc_id for doc_id in dict.fromkeys(doc_ids)
+                      if doc_id and (known is None or doc_id in known)]
+        if not wanted:
+            return []
+
+        found, missing = self.doc_cache.get_many(wanted) if self.doc_cache.enabled else ({}, wanted)
+        if missing:
+            generation = self.doc_cache.generation
+            collection = self.db.collection(self.collection_name)
+            refs = [collection.document(doc_id) for doc_id in missing]
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    data = doc.to_dict()
+                    data['id'] = doc.id
+                    found[doc.id] = data
+                    self.doc_cache.put(doc.id, data, generation)
+            _count_documents("read", len(missing))
+        return [found[doc_id] for doc_id in wanted if doc_id in found]
+
+    def iter_documents(self, start_after: Optional[str] = None, page_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """Yield pages of full documents in ID order, resuming after the `start_after` doc ID."""
+        if not self.db: return
+        collection = self.db.collection(self.collection_name)
+        cursor = start_after
+        while True:
+            query = collection.order_by("__name__").limit(page_size)
+            if cursor:
+                query = query.start_after({"__name__": collection.document(cursor)})
+            page = []
+            # Timed per page: the caller's work between pages is not Firestore time
+            with FIRESTORE_SECONDS.labels("iter_documents").time(), tracer.span("firestore.iter_documents", "firestore"):
+                for doc in query.stream():
+                    data = doc.to_dict()
+                    data['id'] = doc.id
+                    page.append(data)
+                _count_documents("read", len(page))
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            cursor = page[-1]['id']
+
+    @_observed("write_documents")
+    def write_documents(self, docs: List[Dict[str, Any]]) -> List[str]:
+        """Write up to BATCH_WRITE_LIMIT documents in one atomic batch, overwriting existing ones.
+
+        A document's "id" field picks its ID; documents without one get a new ID.
+        """
         if not self.db: return []
-        documents = []
-        for doc_id in doc_ids:
-            doc_ref = self.db.collection(self.collection_name).document(doc_id)
-            doc = doc_ref.get()
-            if doc.exists:
-                data = doc.to_dict()
-                data['id'] = doc.id
-                documents.append(data)
-        return documents
-
-    def add_document(self, data: Dict[str, Any]) -> str:
-        """Adds a new document to the KB."""
+        if len(docs) > BATCH_WRITE_LIMIT:
+            raise ValueError(f"At most {BATCH_WRITE_LIMIT} documents per batch")
+        collection = self.db.collection(self.collection_name)
+        batch = self.db.batch()
+        written = []
+        for doc in docs:
+            data = dict(doc)
+            doc_id = data.pop("id", None) or collection.document().id
+            data.setdefault("status", "unverified")
+            data = _with_chunks(data)
+            batch.set(collection.document(doc_id), data)
+            written.append((doc_id, data))
+        batch.commit()
+        _count_documents("write", len(written))
+        for doc_id, data in written:
+            self.doc_cache.invalidate(doc_id)
+            self._update_index(doc_id, data)
+        return [doc_id for doc_id, _ in written]
+
+    @_observed("new_document_id")
+    def new_document_id(self) -> str:
+        """Reserve an auto-generated document ID (generated client-side, no RPC)."""
+        if not self.db: return ""
+        return self.db.collection(self.collection_name).document().id
+
+    @_observed("add_document")
+    def add_document(self, data: Dict[str, Any], doc_id: Optional[str] = None) -> str:
+        """Adds a new document to the KB, optionally under a reserved ID."""
         if not self.db: return ""
         # Ensure status is set
         if "status" not in data:
             data["status"] = "unverified"
-        
-        update_time, doc_ref = self.db.collection(self.collection_name).add(data)
+        data = _with_chunks(data)
+
+        update_time, doc_ref = self.db.collection(self.collection_name).add(data, document_id=doc_id)
+        _count_documents("write")
+        self._update_index(doc_ref.id, data)
         return doc_ref.id
 
+    @_observed("update_document")
     def update_document(self, doc_id: str, data: Dict[str, Any]):
         """Updates an existing document."""
         if not self.db: return
         doc_ref = self.db.collection(self.collection_name).document(doc_id)
+        data = _with_chunks(data)
         doc_ref.update(data)
+        _count_documents("write")
+        self.doc_cache.invalidate(doc_id)
+        self._update_index(doc_id, data, merge=True)
 
+    @_observed("delete_document")
     def delete_document(self, doc_id: str):
         if not self.db: return
         self.db.collection(self.collection_name).document(doc_id).delete()
+        _count_documents("write")
+        self.doc_cache.invalidate(doc_id)
+        self._update_index(doc_id, None)
+
+    # --- Async wrappers (run on the Firestore executor, never on the event loop) ---
+
+    async def _run(self, fn, *args):
+        # Carry the caller's context (e.g. the open trace span) into the worker thread
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(context.run, fn, *args))
+
+    async def afetch_index(self) -> List[Dict[str, Any]]:
+        if self._index_loaded or not self.db:
+            return self.fetch_index()
+        # Requests arriving during the initial load share one load
+        await single_flight.do(("kb_index",), lambda: self._run(self._ensure_index))
+        return self.fetch_index()
+
+    async def afetch_documents(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        # Identical concurrent fetches share one Firestore read; each caller gets its own copies
+        key = ("kb_docs", tuple(doc_ids))
+        docs = await single_flight.do(key, lambda: self._run(self.fetch_documents, doc_ids))
+        return [dict(doc) for doc in docs]
+
+    async def aadd_document(self, data: Dict[str, Any], doc_id: Optional[str] = None) -> str:
+        return await self._run(self.add_document, data, doc_id)
+
+    async def awrite_documents(self, docs: List[Dict[str, Any]]) -> List[str]:
+        return await self._run(self.write_documents, docs)
+
+    async def aupdate_document(self, doc_id: str, data: Dict[str, Any]):
+        return await self._run(self.update_document, doc_id, data)
+
+    async def adelete_document(self, doc_id: str):
+        return await self._run(self.delete_document, doc_id)
 
 # Global instance
 firebase_client = FirebaseClient()
@@ -0,0 +1,41 @@
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Lazy(Generic[T]):
+    """Thread-safe, lazily built singleton that stands in for the object it builds.
+
+    The factory runs once, on first attribute access or an explicit get()
+    (e.g. during warm-up), so importing a module never pays for it. Attribute
+    reads and writes are forwarded to the built object.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_instance", None)
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        instance: Optional[T] = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    started = time.perf_counter()
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+                    print(f"{self._name} initialized in {time.perf_counter() - started:.2f}s")
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
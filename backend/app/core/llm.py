@@ -0,0 +1,82 @@
+import threading
+from typing import Any, Callable, Dict, Optional
+from app.core.config import get_settings
+from app.core.admission import AdmittedModel, llm_admission
+
+def _default_profiles() -> Dict[str, Dict[str, Any]]:
+    """Per-profile model configuration. Nodes use "default", AIExtractor uses "extractor"."""
+    settings = get_settings()
+    return {
+        "default": {"model": settings.LLM_MODEL, "temperature": 0},
+        "extractor": {"model": settings.EXTRACTOR_MODEL, "temperature": 0},
+    }
+
+# Admission priority per profile; extraction is background work
+PROFILE_PRIORITIES = {"extractor": "background"}
+
+class LLMRegistry:
+    """Process-wide registry of chat model clients.
+
+    One client is built per profile and shared by every caller, so warm
+    HTTP/gRPC connections are reused across nodes and requests. Tests and
+    benchmarks can swap the backend in one place with set_backend().
+    Every client is wrapped so its async calls pass the admission controller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+        self._profiles: Optional[Dict[str, Dict[str, Any]]] = None
+        self._factory: Optional[Callable[[str, Dict[str, Any]], Any]] = None
+
+    @property
+    def profiles(self) -> Dict[str, Dict[str, Any]]:
+        if self._profiles is None:
+            self._profiles = _default_profiles()
+        return self._profiles
+
+    def configure(self, profile: str, **config):
+        """Override the configuration of a profile (e.g. model, temperature)."""
+        with self._lock:
+            self.profiles[profile] = {**self.profiles.get(profile, {}), **config}
+            self._clients.pop(profile, None)
+
+    def set_backend(self, factory: Optional[Callable[[str, Dict[str, Any]], Any]]):
+        """Install factory(profile, config) -> chat model. None restores Gemini."""
+        with self._lock:
+            self._factory = factory
+            self._clients.clear()
+
+    def available(self) -> bool:
+        """True if a backend can be built (a custom factory or a Gemini API key)."""
+        return self._factory is not None or bool(get_settings().GEMINI_API_KEY)
+
+    def get(self, profile: str = "default"):
+        client = self._clients.get(profile)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(profile)
+            if client is None:
+                config = self.profiles.get(profile, self.profiles["default"])
+                factory = self._factory or _gemini_factory
+                client = AdmittedModel(
+                    factory(profile, config),
+                    llm_admission,
+                    PROFILE_PRIORITIES.get(profile, "interactive"),
+                    profile
+                )
+                self._clients[profile] = client
+            return client
+
+def _gemini_factory(profile: str, config: Dict[str, Any]):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    settings = get_settings()
+    return ChatGoogleGenerativeAI(
+        google_api_key=settings.GEMINI_API_KEY,
+        max_retries=settings.LLM_MAX_RETRIES,
+        **config
+    )
+
+# Global instance
+llm_registry = LLMRegistry()
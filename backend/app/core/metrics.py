@@ -0,0 +1,100 @@
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, Iterator, Tuple
+from prometheus_client import REGISTRY, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Node and LLM calls take from milliseconds (cache hits, compaction) to tens of seconds (generation)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+NODE_SECONDS = Histogram("agent_node_seconds", "Latency of LangGraph nodes", ["node"], buckets=LATENCY_BUCKETS)
+INTENTS = Counter("agent_intent_total", "Classified user intents", ["intent"])
+
+LLM_SECONDS = Histogram("llm_call_seconds", "Latency of LLM calls (after admission)", ["profile"], buckets=LATENCY_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens, reported by the model or estimated", ["profile", "direction"])
+
+FIRESTORE_SECONDS = Histogram("firestore_call_seconds", "Latency of FirebaseClient operations", ["method"], buckets=LATENCY_BUCKETS)
+FIRESTORE_DOCUMENTS = Counter("firestore_documents_total", "Firestore documents read or written", ["op"])
+
+EXTRACTOR_SECONDS = Histogram("extractor_call_seconds", "Latency of AIExtractor calls", ["method"], buckets=LATENCY_BUCKETS)
+
+def timed(histogram: Histogram, *labels: str) -> Callable:
+    """Decorator recording a sync or async function's latency in `histogram`.
+
+    The labelled child is bound once, so each call only pays for a clock read
+    and one locked add.
+    """
+    child = histogram.labels(*labels)
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wrap a graph node so its latency is recorded under `name`."""
+    return timed(NODE_SECONDS, name)(node)
+
+def count_documents(op: str, count: int = 1):
+    if count:
+        FIRESTORE_DOCUMENTS.labels(op).inc(count)
+
+class StatsCollector(Collector):
+    """Exposes the `stats()` dicts of in-process components as gauges.
+
+    Values are read at scrape time, so the components need no metrics code of
+    their own. Nested dicts are flattened, e.g. {"queued": {"background": 2}}
+    becomes `<name>_queued_background`.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register(self, name: str, stats: Callable[[], Dict[str, Any]]):
+        self._sources[name] = stats
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        for name, stats in self._sources.items():
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"Metrics: stats for {name} failed: {e}")
+                continue
+            for key, value in _flatten(values):
+                yield GaugeMetricFamily(f"{name}_{key}", f"{name} {key.replace('_', ' ')}", value=value)
+
+def _flatten(values: Dict[str, Any], prefix: str = "") -> Iterator:
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+def register_stats(name: str, stats: Callable[[], Dict[str, Any]]):
+    """Publish a component's stats() on /metrics under the `name` prefix."""
+    stats_collector.register(name, stats)
+
+def render() -> Tuple[bytes, str]:
+    """(body, content_type) of the Prometheus text exposition."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
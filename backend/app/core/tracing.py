@@ -0,0 +1,224 @@
+import contextvars
+import functools
+import heapq
+import inspect
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+from app.core.config import get_settings
+
+@dataclass
+class Span:
+    name: str
+    kind: str  # request, node, llm, firestore or extractor
+    started_at: float = field(default_factory=time.time)
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    children: List["Span"] = field(default_factory=list)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "attrs": self.attrs,
+            "error": self.error,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+@dataclass
+class Trace:
+    id: str
+    session_id: Optional[str]
+    root: Span
+
+    @property
+    def duration(self) -> float:
+        return self.root.duration or 0.0
+
+    def span_count(self) -> int:
+        count, stack = 0, [self.root]
+        while stack:
+            span = stack.pop()
+            count += 1
+            stack.extend(span.children)
+        return count
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "name": self.root.name,
+            "started_at": self.root.started_at,
+            "duration": self.duration,
+            "spans": self.span_count(),
+            "error": self.root.error,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "session_id": self.session_id, "duration": self.duration, "root": self.root.to_dict()}
+
+# Innermost open span of the current request; None outside sampled requests
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+
+def _restore(token: contextvars.Token):
+    """Undo a _current_span.set(). A streaming response generator may be closed
+    (client disconnect) in another context than the one that set the token."""
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        _current_span.set(None)
+
+class Tracer:
+    """Records a span tree per sampled request into a bounded ring buffer.
+
+    Spans attach to the innermost open span of the current context, so they
+    follow the request into graph node tasks and Firestore executor threads
+    (as long as the context is copied). Outside a sampled request, span() is
+    a no-op costing one context variable lookup. Finished traces can also be
+    appended to a JSONL file for offline analysis.
+    """
+
+    def __init__(self, capacity: int = 200, sample_rate: float = 1.0, export_path: str = ""):
+        self.sample_rate = sample_rate
+        self.export_path = export_path
+        self._traces: Deque[Trace] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.skipped = 0
+        # Export writes happen on one background thread, in order, off the event loop
+        self._exporter: Optional[ThreadPoolExecutor] = None
+
+    @contextmanager
+    def trace(self, name: str, session_id: Optional[str] = None, **attrs):
+        """Open the root span of a request (subject to sampling)."""
+        if random.random() >= self.sample_rate:
+            self.skipped += 1
+            # Also detach from any enclosing trace
+            token = _current_span.set(None)
+            try:
+                yield None
+            finally:
+                _restore(token)
+            return
+
+        root = Span(name=name, kind="request", attrs=attrs)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = repr(e)
+            raise
+        finally:
+            _restore(token)
+            root.finish()
+            self._record(Trace(id=uuid.uuid4().hex, session_id=session_id, root=root))
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attrs):
+        """Open a child span of the current one; yields None when not tracing."""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(name=name, kind=kind, attrs=attrs)
+        parent.children.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            _restore(token)
+            span.finish()
+
+    def annotate(self, **attrs):
+        """Set attributes on the current span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.attrs.update(attrs)
+
+    def add(self, key: str, amount: int):
+        """Add to a counter attribute of the current span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.attrs[key] = span.attrs.get(key, 0) + amount
+
+    def slowest(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces)
+        return [trace.summary() for trace in heapq.nlargest(limit, traces, key=lambda t: t.duration)]
+
+    def for_session(self, session_id: str) -> List[Dict[str, Any]]:
+        """Full traces of a session, most recent first."""
+        with self._lock:
+            traces = [trace for trace in self._traces if trace.session_id == session_id]
+        return [trace.to_dict() for trace in reversed(traces)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._traces),
+            "capacity": self._traces.maxlen,
+            "sample_rate": self.sample_rate,
+            "recorded": self.recorded,
+            "skipped": self.skipped,
+        }
+
+    def _record(self, trace: Trace):
+        with self._lock:
+            self._traces.append(trace)
+            self.recorded += 1
+            if self.export_path and self._exporter is None:
+                self._exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+        if self.export_path:
+            self._exporter.submit(self._export, trace)
+
+    def _export(self, trace: Trace):
+        try:
+            with open(self.export_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace.to_dict(), default=str) + "\n")
+        except OSError as e:
+            print(f"Trace export failed: {e}")
+
+def traced(name: str, kind: str) -> Callable:
+    """Decorator running a sync or async function inside a span."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name, kind):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _build_tracer() -> Tracer:
+    settings = get_settings()
+    return Tracer(
+        capacity=settings.TRACE_BUFFER_SIZE,
+        sample_rate=settings.TRACE_SAMPLE_RATE,
+        export_path=settings.TRACE_EXPORT_PATH
+    )
+
+# Global instance
+tracer = _build_tracer()
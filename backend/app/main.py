@@ -1,15 +1,34 @@
 import os
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from app.routers import chat, kb, extract
+from app.routers import chat, kb, extract, jobs, traces
 from app.core.config import get_settings
+from app.core import metrics
 
 # Ensure Google Auth can find credentials if needed
 # Typically handled by Firebase Admin SDK, but if Gemini needs it:
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = get_settings().FIREBASE_SERVICE_ACCOUNT_PATH
 
-app = FastAPI(title="Hybris AI Agent Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(run_cleanup_loop())]
+    if get_settings().WARMUP_ON_STARTUP:
+        # In the background: /health answers at once, /ready once warm-up is done
+        tasks.append(asyncio.create_task(warm_up()))
+    else:
+        warmup_state["status"] = "ready"
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await job_queue.shutdown()
+    firebase_client.close()
+
+app = FastAPI(title="Hybris AI Agent Backend", lifespan=lifespan)
 
 # CORS Configuration
 origins = [
@@ -33,18 +52,93 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+def readiness_check(response: Response):
+    """Readiness probe: 503 until warm-up has finished (or if a warm-up step failed)."""
+    if warmup_state["status"] != "ready":
+        response.status_code = 503
+    return warmup_state
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape target."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 app.include_router(chat.router, prefix="/api")
 app.include_router(kb.router, prefix="/api")
 app.include_router(extract.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(traces.router, prefix="/api")
 
-# --- Background Cleanup ---
-import asyncio
 from app.services.session import session_manager
 from app.services.agent import app as agent_app
+from app.services.answer_cache import answer_cache
+from app.services.jobs import job_queue
+from app.core.firebase import firebase_client
+from app.core.admission import llm_admission
+from app.core.singleflight import single_flight
+from app.core.tracing import tracer
+from app.core.llm import llm_registry
+from app.services.extractor import extractor
+# The BM25 and vector indexes follow KB changes; subscribed before the KB index
+# first loads, they get its initial events instead of a second full read
+from app.services.search import kb_search_index
+from app.services.vector_store import kb_vector_index
+
+# Live component state, read at scrape time
+metrics.register_stats("sessions", session_manager.stats)
+metrics.register_stats("llm_admission", llm_admission.stats)
+metrics.register_stats("doc_cache", firebase_client.doc_cache.stats)
+metrics.register_stats("answer_cache", answer_cache.stats)
+metrics.register_stats("single_flight", single_flight.stats)
+metrics.register_stats("jobs", job_queue.stats)
+metrics.register_stats("traces", tracer.stats)
+
+# --- Warm-up ---
+# Firestore, the LLM clients, the extractor and the compiled graph are built
+# lazily, so importing the app stays cheap; warm-up builds them before traffic.
+
+warmup_state = {"status": "starting", "seconds": None, "checks": {}}
+
+def _connect_firestore():
+    if not firebase_client.connect():
+        raise RuntimeError("Firestore is not configured or could not be initialized")
+    return {"connected": True}
 
-@app.on_event("startup")
-async def start_cleanup_task():
-    asyncio.create_task(run_cleanup_loop())
+def _warm_llm_clients():
+    if not llm_registry.available():
+        return {"configured": False}
+    for profile in list(llm_registry.profiles):
+        llm_registry.get(profile)
+    return {"profiles": list(llm_registry.profiles)}
+
+WARMUP_STEPS = (
+    ("firestore", _connect_firestore),
+    ("kb_index", lambda: {"documents": len(firebase_client.fetch_index())}),
+    ("llm", _warm_llm_clients),
+    ("extractor", extractor.get),
+    ("graph", agent_app.get),
+)
+
+async def warm_up():
+    started = time.perf_counter()
+    for name, step in WARMUP_STEPS:
+        step_started = time.perf_counter()
+        try:
+            detail = await asyncio.to_thread(step)
+            check = {"ok": True, **(detail if isinstance(detail, dict) else {})}
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {e}")
+            check = {"ok": False, "error": str(e)}
+        check["seconds"] = round(time.perf_counter() - step_started, 3)
+        warmup_state["checks"][name] = check
+    warmup_state["seconds"] = round(time.perf_counter() - started, 3)
+    ok = all(check["ok"] for check in warmup_state["checks"].values())
+    warmup_state["status"] = "ready" if ok else "failed"
+    print(f"Warm-up {warmup_state['status']} in {warmup_state['seconds']}s")
+
+# --- Background Cleanup ---
 
 async def run_cleanup_loop():
     print("🧹 Background session cleanup task started.")
@@ -52,22 +146,17 @@ async def run_cleanup_loop():
         try:
             await asyncio.sleep(60) # Check every minute
             
-            # Use 5 minutes (300 seconds) timeout
-            expired_sessions = session_manager.get_expired_sessions(timeout_seconds=300)
-            
+            ttl = get_settings().SESSION_TTL_SECONDS
+            # Threads idle in the shared checkpoint store (any worker may have served them)
+            expired_sessions = await agent_app.checkpointer.aexpire_threads(ttl)
             if expired_sessions:
-                print(f"🧹 Found {len(expired_sessions)} expired sessions: {expired_sessions}")
-                checkpointer = agent_app.checkpointer
-                
-                if hasattr(checkpointer, 'storage'):
-                    for session_id in expired_sessions:
-                        if session_id in checkpointer.storage:
-                            del checkpointer.storage[session_id]
-                            print(f"   - Deleted memory for: {session_id}")
-                        session_manager.remove_session(session_id)
-                else:
-                    print("   - Error: Checkpointer storage not accessible.")
-                    
+                print(f"🧹 Expired {len(expired_sessions)} sessions: {expired_sessions}")
+            for session_id in expired_sessions:
+                session_manager.remove_session(session_id)
+
+            # Drop local tracking for sessions that went quiet here
+            session_manager.get_expired_sessions(timeout_seconds=ttl)
+
         except Exception as e:
             print(f"Error in cleanup loop: {e}")
             await asyncio.sleep(60) # Backoff
@@ -38,3 +38,10 @@ class ExtractAndSaveRequest(BaseModel):
     text: str
     type: str = "code"
     ai_created: bool = False
+
+class ExtractBatchRequest(BaseModel):
+    texts: List[str]
+    type: str = "code"
+    ai_created: bool = False
+    save: bool = False
+    concurrency: Optional[int] = None  # Capped by EXTRACT_BATCH_CONCURRENCY
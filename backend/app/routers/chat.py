@@ -2,33 +2,68 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from app.models.schemas import ChatRequest
 from app.services.agent import app as agent_app
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
 import json
 import asyncio
 
 router = APIRouter()
 
-from app.services.session import session_manager
+# Nodes whose LLM output is streamed to the client token by token
+TOKEN_STREAM_NODES = {"generator", "direct_response"}
+
+QUEUED_STEP = "Lots of questions coming in right now, you're in the queue..."
+
+from app.services.session import session_manager, approx_state_bytes
+from app.core.admission import llm_admission, llm_session, Overloaded
+from app.core.tracing import tracer
+
+async def _drop_sessions(session_ids):
+    """Delete checkpoints of sessions evicted by the session manager."""
+    for session_id in session_ids:
+        await agent_app.checkpointer.adelete_thread(session_id)
+        print(f"Evicted session memory for: {session_id}")
 
 @router.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     # Update activity timestamp
-    session_manager.update_activity(request.session_id)
+    await _drop_sessions(session_manager.update_activity(request.session_id))
     
-    async def event_generator():
+    async def stream_turn():
         # Use session_id for thread persistence
         config = {"configurable": {"thread_id": request.session_id}}
         
         # Only send the new message, history is loaded from memory
         inputs = {"messages": [HumanMessage(content=request.message)]}
         
-        # Stream events from LangGraph
+        # LLM calls made by the graph are scheduled fairly per session
+        llm_session.set(request.session_id)
+        queued = llm_admission.would_queue()
+        if queued:
+            yield json.dumps({"type": "step", "content": QUEUED_STEP}) + "\n"
+
+        # Stream node updates plus LLM tokens from the answering nodes
+        # The generator's answer is held back until the learner (which always runs
+        # next) has had its say, so the client gets exactly one final answer event
+        pending_answer = ""
+        drafting_announced = False
         try:
-            async for event in agent_app.astream(inputs, config=config):
+            async for mode, event in agent_app.astream(inputs, config=config, stream_mode=["updates", "messages"]):
+                if mode == "messages":
+                    chunk, metadata = event
+                    node_name = metadata.get("langgraph_node")
+                    if node_name in TOKEN_STREAM_NODES and isinstance(chunk, AIMessageChunk) and chunk.content:
+                        if node_name == "generator" and not drafting_announced:
+                            drafting_announced = True
+                            yield json.dumps({"type": "step", "content": "Drafting the answer for you..."}) + "\n"
+                        yield json.dumps({"type": "token", "content": chunk.content}) + "\n"
+                    continue
+
                 for node_name, state in event.items():
+                    state = state or {}
                     # Determine step messages based on node names
                     if node_name == "classifier":
                         intent = state.get("user_intent", "unknown")
+                        tracer.annotate(intent=intent)
                         if intent == "greeting":
                             yield json.dumps({"type": "step", "content": "Just saying hello..."}) + "\n"
                         elif intent == "general_chat":
@@ -47,15 +82,24 @@ async def chat_endpoint(request: ChatRequest):
                             yield json.dumps({"type": "step", "content": "Using my general training to create a solution..."}) + "\n"
                     
                     elif node_name == "generator":
-                        yield json.dumps({"type": "step", "content": "Drafting the answer for you..."}) + "\n"
-                        answer = state.get("answer", "")
-                        if answer:
-                            yield json.dumps({"type": "answer", "content": answer}) + "\n"
+                        if state.get("cache_hit"):
+                            yield json.dumps({"type": "step", "content": "I've answered this question before, reusing that answer..."}) + "\n"
+                        elif not drafting_announced:
+                            yield json.dumps({"type": "step", "content": "Drafting the answer for you..."}) + "\n"
+                        pending_answer = state.get("answer", "")
                     
                     elif node_name == "learner":
                         answer = state.get("answer", "")
                         if answer:
                             yield json.dumps({"type": "step", "content": "Checking if this answer is worth saving..."}) + "\n"
+                            # Only the learner suffix goes out as a delta
+                            if answer.startswith(pending_answer) and len(answer) > len(pending_answer):
+                                yield json.dumps({"type": "token", "content": answer[len(pending_answer):]}) + "\n"
+                        else:
+                            answer = pending_answer
+                        pending_answer = ""
+                        if answer:
+                            # Full answer kept for clients that ignore token events
                             yield json.dumps({"type": "answer", "content": answer}) + "\n"
                     
                     elif node_name == "direct_response":
@@ -68,41 +112,52 @@ async def chat_endpoint(request: ChatRequest):
                         answer = state.get("answer", "")
                         if answer:
                             yield json.dumps({"type": "answer", "content": answer}) + "\n"
+        except Overloaded as e:
+            if pending_answer:
+                yield json.dumps({"type": "answer", "content": pending_answer}) + "\n"
+            if not queued:
+                yield json.dumps({"type": "step", "content": QUEUED_STEP}) + "\n"
+            yield json.dumps({"type": "error", "code": "overloaded", "content": str(e)}) + "\n"
         except Exception as e:
+            if pending_answer:
+                yield json.dumps({"type": "answer", "content": pending_answer}) + "\n"
             yield json.dumps({"type": "error", "content": str(e)}) + "\n"
 
+        # Record the session's state size so the memory cap can be enforced
+        try:
+            snapshot = await agent_app.aget_state(config)
+            await _drop_sessions(session_manager.update_activity(
+                request.session_id, state_bytes=approx_state_bytes(snapshot.values)
+            ))
+        except Exception as e:
+            print(f"Error updating session size: {e}")
+
+    async def event_generator():
+        # One span tree per turn (if sampled), inspectable via /api/admin/traces
+        with tracer.trace("chat", request.session_id, message_chars=len(request.message)):
+            async for line in stream_turn():
+                yield line
+
     return StreamingResponse(event_generator(), media_type="application/x-ndjson")
 
+@router.get("/sessions/stats")
+async def session_stats():
+    """Live session count, approximate state bytes, and expiry/eviction counters."""
+    return session_manager.stats()
+
+@router.get("/llm/stats")
+async def llm_stats():
+    """LLM admission control: in-flight calls, queue depth per priority and wait times."""
+    return llm_admission.stats()
+
 @router.delete("/session/{session_id}")
 async def clear_session(session_id: str):
     """Clear server-side memory for a specific session."""
     try:
-        # Access the checkpointer (MemorySaver) directly
-        # MemorySaver stores data in .storage dictionary
-        # We need to find keys related to this thread_id
-        
-        checkpointer = agent_app.checkpointer
-        if hasattr(checkpointer, 'storage'):
-            keys_to_delete = []
-            for key in checkpointer.storage.keys():
-                # Key typically involves thread_id. 
-                # LangGraph MemorySaver keys are (thread_id, checkpoint_id) tuples usually?
-                # Actually, looking at MemorySaver implementation:
-                # storage[thread_id][checkpoint_id] = checkpoint
-                
-                # Wait, MemorySaver implementation varies.
-                # Standard MemorySaver: storage is Dict[str, Dict[str, Checkpoint]] (thread_id -> checkpoint_id -> checkpoint)
-                
-                if key == session_id:
-                    keys_to_delete.append(key)
-            
-            for key in keys_to_delete:
-                del checkpointer.storage[key]
-                print(f"Deleted session memory for: {key}")
-                
-            return {"status": "success", "message": f"Session {session_id} cleared from memory"}
-        else:
-            return {"status": "error", "message": "Checkpointer storage not accessible"}
+        await agent_app.checkpointer.adelete_thread(session_id)
+        session_manager.remove_session(session_id)
+        print(f"Deleted session memory for: {session_id}")
+        return {"status": "success", "message": f"Session {session_id} cleared from memory"}
             
     except Exception as e:
         print(f"Error clearing session: {e}")
@@ -1,11 +1,28 @@
 from fastapi import APIRouter
-from app.models.schemas import ExtractRequest, ExtractResponse, ExtractAndSaveRequest
+from fastapi.responses import StreamingResponse
+from app.models.schemas import ExtractRequest, ExtractResponse, ExtractAndSaveRequest, ExtractBatchRequest
 from app.services.extractor import extractor
 from app.core.firebase import firebase_client
+from app.core.config import get_settings
 from datetime import datetime
+import asyncio
+import json
 
 router = APIRouter()
 
+async def save_extracted(text: str, metadata: ExtractResponse, type: str, ai_created: bool) -> str:
+    """Store a snippet and its extracted metadata as an unverified KB entry."""
+    return await firebase_client.aadd_document({
+        "title": metadata.title,
+        "content": text,
+        "tags": metadata.tags,
+        "type": type,
+        "summary": metadata.summary,
+        "status": "unverified",
+        "ai_created": ai_created,
+        "created_at": datetime.now().isoformat()
+    })
+
 @router.post("/extract", response_model=ExtractResponse)
 async def extract_metadata(request: ExtractRequest):
     """Extract metadata without saving"""
@@ -15,21 +32,47 @@ async def extract_metadata(request: ExtractRequest):
 async def extract_and_save(request: ExtractAndSaveRequest):
     """Extract metadata and save to Firebase KB in one operation"""
     metadata = await extractor.extract_metadata(request.text)
-    
-    doc_id = firebase_client.add_document({
-        "title": metadata.title,
-        "content": request.text,
-        "tags": metadata.tags,
-        "type": request.type,
-        "summary": metadata.summary,
-        "status": "unverified",
-        "ai_created": request.ai_created,
-        "created_at": datetime.now().isoformat()
-    })
-    
+    doc_id = await save_extracted(request.text, metadata, request.type, request.ai_created)
+
     return {
         "id": doc_id,
         "title": metadata.title,
         "tags": metadata.tags,
         "summary": metadata.summary
     }
+
+@router.post("/extract/batch")
+async def extract_batch(request: ExtractBatchRequest):
+    """Extract (and optionally save) many snippets, streaming NDJSON results as each finishes."""
+    limit = get_settings().EXTRACT_BATCH_CONCURRENCY
+    if request.concurrency:
+        limit = max(1, min(request.concurrency, limit))
+    semaphore = asyncio.Semaphore(limit)
+
+    async def process(index: int, text: str) -> dict:
+        async with semaphore:
+            try:
+                metadata = await extractor.extract_metadata(text, raise_errors=True)
+                result = {"type": "result", "index": index, "status": "ok", **metadata.model_dump()}
+                if request.save:
+                    result["id"] = await save_extracted(text, metadata, request.type, request.ai_created)
+                return result
+            except Exception as e:
+                return {"type": "result", "index": index, "status": "error", "error": str(e)}
+
+    async def result_generator():
+        tasks = [asyncio.create_task(process(i, text)) for i, text in enumerate(request.texts)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                succeeded += result["status"] == "ok"
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"type": "done", "total": len(tasks), "succeeded": succeeded,
+                              "failed": len(tasks) - succeeded}) + "\n"
+        finally:
+            # Client went away: stop the remaining work
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(result_generator(), media_type="application/x-ndjson")
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, HTTPException
+from app.services.jobs import job_queue
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a background job (pending, running, done or failed)."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -1,12 +1,195 @@
-from fastapi import APIRouter, HTTPException
+import hashlib
+import json
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.models.schemas import KBEntry
-from app.core.firebase import firebase_client
+from app.core.firebase import firebase_client, BATCH_WRITE_LIMIT, INDEX_FIELDS
+from app.core.config import get_settings
+
+try:
+    import orjson
+except ImportError:  # Optional: faster encoding for large listings
+    orjson = None
 
 router = APIRouter()
 
+FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Line-level errors included in an import report
+MAX_REPORTED_ERRORS = 100
+
+def _import_doc_id(line_no: int, line: bytes) -> str:
+    """ID for an imported line without one. Derived from the line, so resending
+    the file (e.g. resuming after a failed batch) overwrites instead of duplicating."""
+    return hashlib.sha1(b"%d:" % line_no + line.strip()).hexdigest()[:20]
+
+def _fast_json(content, headers: Dict[str, str]) -> Response:
+    """JSON response using orjson when it is installed."""
+    if orjson is not None:
+        return Response(orjson.dumps(content, default=str), media_type="application/json", headers=headers)
+    return JSONResponse(jsonable_encoder(content), headers=headers)
+
+def _not_modified(request: Request, etag: str, modified_at: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
 @router.get("/kb")
-def get_kb_index():
-    return firebase_client.fetch_index()
+def get_kb_index(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status: Optional[str] = None,
+    ai_created: Optional[bool] = None,
+    tag: Optional[str] = None
+):
+    """List the KB.
+
+    With no parameters this returns the whole cached index, as before. With
+    `limit`/`cursor`, `fields` (comma-separated projection) or filters it returns
+    one page, `{"items": [...], "next_cursor": ...}`, queried from Firestore
+    (index fields only, unless `fields` says otherwise). Either way the
+    response carries an ETag/Last-Modified from the KB change counter, and
+    conditional requests get 304 while nothing has changed.
+    """
+    settings = get_settings()
+    marker, modified_at = firebase_client.kb_change_marker()
+    etag = f'W/"{marker}"'
+    headers = {"ETag": etag, "Last-Modified": formatdate(modified_at, usegmt=True), "Cache-Control": "no-cache"}
+    if _not_modified(request, etag, modified_at):
+        return Response(status_code=304, headers=headers)
+
+    filters = []
+    if status is not None:
+        filters.append(("status", "==", status))
+    if ai_created is not None:
+        filters.append(("ai_created", "==", ai_created))
+    if tag is not None:
+        filters.append(("tags", "array_contains", tag))
+    if not (limit or cursor or fields or filters):
+        return _fast_json(firebase_client.fetch_index(), headers)
+
+    # Pages carry the index fields unless asked otherwise
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(INDEX_FIELDS)
+    if field_list and not all(FIELD_NAME_RE.match(f) for f in field_list):
+        raise HTTPException(status_code=400, detail="Invalid field name in 'fields'")
+    page_size = max(1, min(limit or settings.KB_PAGE_SIZE, settings.KB_MAX_PAGE_SIZE))
+    docs, next_cursor = firebase_client.query_documents(filters, field_list, cursor, page_size)
+    return _fast_json({"items": docs, "next_cursor": next_cursor}, headers)
+
+@router.get("/kb/export")
+def export_kb(cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Stream every document (full content) as NDJSON, ordered by ID.
+
+    To resume an interrupted export, pass the ID of the last line received as `cursor`.
+    """
+    page_size = get_settings().KB_EXPORT_PAGE_SIZE
+
+    def line_generator():
+        sent, last_id = 0, cursor
+        try:
+            for page in firebase_client.iter_documents(start_after=cursor, page_size=page_size):
+                for doc in page:
+                    if limit is not None and sent >= limit:
+                        return
+                    yield json.dumps(doc, default=str) + "\n"
+                    sent += 1
+                    last_id = doc["id"]
+        except Exception as e:
+            print(f"KB export error after {last_id}: {e}")
+            yield json.dumps({"_error": str(e), "cursor": last_id}) + "\n"
+
+    return StreamingResponse(line_generator(), media_type="application/x-ndjson")
+
+@router.post("/kb/import")
+async def import_kb(request: Request, start_line: int = 0):
+    """Import NDJSON documents (e.g. from /kb/export) using Firestore batched writes.
+
+    The body is read as a stream and written batch by batch, so memory stays flat
+    however large the file is. Each batch is reported separately; to resume, send
+    the same file again with `start_line` set to the report's `next_line`.
+    Malformed lines are counted as `invalid` and skipped; they do not hold the
+    resume point back, since sending them again would not help. Lines without an
+    "id" get one derived from the line, so batches written again on a resume
+    overwrite the same documents.
+    """
+    batch_size = max(1, min(get_settings().KB_IMPORT_BATCH_SIZE, BATCH_WRITE_LIMIT))
+    report = {"written": 0, "failed": 0, "invalid": 0, "batches": [], "errors": [], "next_line": start_line}
+    batch, batch_lines = [], []
+
+    async def flush():
+        try:
+            await firebase_client.awrite_documents(batch)
+            report["written"] += len(batch)
+            report["batches"].append({"first_line": batch_lines[0], "last_line": batch_lines[-1],
+                                      "count": len(batch), "status": "ok"})
+            if not report["failed"]:
+                report["next_line"] = batch_lines[-1] + 1
+        except Exception as e:
+            print(f"KB import batch error (lines {batch_lines[0]}-{batch_lines[-1]}): {e}")
+            report["failed"] += len(batch)
+            report["batches"].append({"first_line": batch_lines[0], "last_line": batch_lines[-1],
+                                      "count": len(batch), "status": "error", "error": str(e)})
+        batch.clear()
+        batch_lines.clear()
+
+    def add_line(line_no: int, line: bytes):
+        try:
+            doc = json.loads(line)
+            if not isinstance(doc, dict) or "_error" in doc:
+                raise ValueError("expected a JSON object per line")
+        except ValueError as e:
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line_no, "error": str(e)})
+            return
+        if not doc.get("id"):
+            doc["id"] = _import_doc_id(line_no, line)
+        batch.append(doc)
+        batch_lines.append(line_no)
+
+    # Only the new chunk is split; `pending` holds the pieces of an unfinished line
+    line_no, pending = 0, []
+    async for chunk in request.stream():
+        *lines, tail = chunk.split(b"\n")
+        if lines:
+            lines[0] = b"".join(pending) + lines[0]
+            pending = []
+        pending.append(tail)
+        for line in lines:
+            if line_no >= start_line and line.strip():
+                add_line(line_no, line)
+                if len(batch) >= batch_size:
+                    await flush()
+            line_no += 1
+    last_line = b"".join(pending)
+    if last_line.strip():
+        if line_no >= start_line:
+            add_line(line_no, last_line)
+        line_no += 1
+    if batch:
+        await flush()
+    if not report["failed"]:
+        report["next_line"] = max(start_line, line_no)
+    return report
+
+@router.get("/kb/cache/stats")
+def get_doc_cache_stats():
+    """Hit/miss/eviction counters of the full-document cache."""
+    return firebase_client.doc_cache.stats()
 
 @router.get("/kb/{doc_id}")
 def get_kb_document(doc_id: str):
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.core.tracing import tracer
+
+router = APIRouter()
+
+@router.get("/admin/traces")
+async def list_traces(limit: int = Query(20, ge=1, le=200)):
+    """Summaries of the slowest recorded chat turns, slowest first."""
+    return {"stats": tracer.stats(), "traces": tracer.slowest(limit)}
+
+@router.get("/admin/traces/{session_id}")
+async def get_session_traces(session_id: str):
+    """Full span trees of a session's recorded turns, most recent first."""
+    traces = tracer.for_session(session_id)
+    if not traces:
+        raise HTTPException(status_code=404, detail="No traces recorded for this session")
+    return traces
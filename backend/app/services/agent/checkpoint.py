@@ -0,0 +1,509 @@
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from app.core.config import get_settings, resolve_path
+
+# Serialized value as produced by serde.dumps_typed: (type, bytes)
+Typed = Tuple[str, bytes]
+# (checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint, metadata)
+CheckpointRow = Tuple[str, str, Optional[str], Typed, Typed]
+# (task_id, idx, channel, value, task_path)
+WriteRow = Tuple[str, int, str, Typed, str]
+
+class CheckpointStore:
+    """Storage backend used by StoreCheckpointer. Rows are already serialized."""
+
+    def put_checkpoint(self, thread_id: str, row: CheckpointRow): ...
+    def get_checkpoint(self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[CheckpointRow]: ...
+    def list_checkpoints(self, thread_id: Optional[str], checkpoint_ns: Optional[str]) -> Iterator[Tuple[str, CheckpointRow]]: ...
+    def put_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, writes: List[WriteRow]): ...
+    def get_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[WriteRow]: ...
+    def delete_thread(self, thread_id: str): ...
+    def prune(self, thread_id: str, checkpoint_ns: str, keep: int): ...
+    def expired_threads(self, ttl_seconds: float) -> List[str]: ...
+
+# --- SQLite (WAL) backend ---
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Local durable store. WAL mode lets several uvicorn workers on one host share the file."""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, parent_checkpoint_id TEXT,
+                type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+                channel TEXT, type TEXT, value BLOB, task_path TEXT,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, updated_at REAL);
+            CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at);
+        """)
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN ... COMMIT, rolled back on error (e.g. "database is locked" while
+        another worker writes) so the connection never stays inside a transaction.
+        The caller holds self._lock."""
+        self._conn.execute("BEGIN")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+
+    def _touch(self, thread_id: str):
+        self._conn.execute(
+            "INSERT INTO threads (thread_id, updated_at) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (thread_id, time.time())
+        )
+
+    @staticmethod
+    def _row(r) -> CheckpointRow:
+        return (r[0], r[1], r[2], (r[3], r[4]), (r[5], r[6]))
+
+    def put_checkpoint(self, thread_id: str, row: CheckpointRow):
+        ns, checkpoint_id, parent_id, checkpoint, metadata = row
+        with self._lock:
+            with self._transaction():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, ns, checkpoint_id, parent_id, checkpoint[0], checkpoint[1], metadata[0], metadata[1])
+                )
+                self._touch(thread_id)
+
+    def get_checkpoint(self, thread_id, checkpoint_ns, checkpoint_id):
+        query = ("SELECT checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                 "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?")
+        if checkpoint_id:
+            args = (thread_id, checkpoint_ns, checkpoint_id)
+            query += " AND checkpoint_id = ?"
+        else:
+            args = (thread_id, checkpoint_ns)
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            r = self._conn.execute(query, args).fetchone()
+        return self._row(r) if r else None
+
+    def list_checkpoints(self, thread_id, checkpoint_ns):
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                 "FROM checkpoints")
+        clauses, args = [], []
+        if thread_id is not None:
+            clauses.append("thread_id = ?")
+            args.append(thread_id)
+        if checkpoint_ns is not None:
+            clauses.append("checkpoint_ns = ?")
+            args.append(checkpoint_ns)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        for r in rows:
+            yield r[0], self._row(r[1:])
+
+    def put_writes(self, thread_id, checkpoint_ns, checkpoint_id, writes):
+        with self._lock:
+            with self._transaction():
+                for task_id, idx, channel, value, task_path in writes:
+                    # Special channels (negative idx) overwrite, regular writes are idempotent
+                    verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+                    self._conn.execute(
+                        f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value[0], value[1], task_path)
+                    )
+                self._touch(thread_id)
+
+    def get_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchall()
+        return [(r[0], r[1], r[2], (r[3], r[4]), r[5]) for r in rows]
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            with self._transaction():
+                for table in ("checkpoints", "writes", "threads"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def prune(self, thread_id, checkpoint_ns, keep):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                (thread_id, checkpoint_ns, keep - 1)
+            ).fetchone()
+            if row is None:
+                return
+            with self._transaction():
+                for table in ("checkpoints", "writes"):
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                        (thread_id, checkpoint_ns, row[0])
+                    )
+
+    def expired_threads(self, ttl_seconds):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT thread_id FROM threads WHERE updated_at < ?", (time.time() - ttl_seconds,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+# --- Shared key-value backend (Redis, or an in-process stand-in) ---
+
+class LocalKV:
+    """In-process stand-in for the subset of the Redis API used by KVCheckpointStore."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _get(self, name: str, default=None):
+        expires = self._expires.get(name)
+        if expires is not None and expires <= time.time():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+        return self._data.get(name, default)
+
+    def hset(self, name, key, value):
+        with self._lock:
+            self._get(name)
+            self._data.setdefault(name, {})[key] = value
+
+    def hsetnx(self, name, key, value):
+        with self._lock:
+            h = self._get(name)
+            if h is not None and key in h:
+                return 0
+            self._data.setdefault(name, {})[key] = value
+            return 1
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._get(name, {}))
+
+    def hdel(self, name, *keys):
+        with self._lock:
+            h = self._get(name, {})
+            for key in keys:
+                h.pop(key, None)
+
+    def delete(self, *names):
+        with self._lock:
+            for name in names:
+                self._data.pop(name, None)
+                self._expires.pop(name, None)
+
+    def expire(self, name, seconds):
+        with self._lock:
+            if self._get(name) is not None:
+                self._expires[name] = time.time() + seconds
+
+    def zadd(self, name, mapping):
+        with self._lock:
+            self._data.setdefault(name, {}).update(mapping)
+
+    def zrangebyscore(self, name, min, max):
+        with self._lock:
+            z = self._data.get(name, {})
+            return [m for m, score in sorted(z.items(), key=lambda item: item[1]) if min <= score <= max]
+
+    def zrem(self, name, *members):
+        with self._lock:
+            z = self._data.get(name, {})
+            for member in members:
+                z.pop(member, None)
+
+def _pack(value: Typed) -> List[str]:
+    return [value[0], base64.b64encode(value[1]).decode()]
+
+def _unpack(value: List[str]) -> Typed:
+    return (value[0], base64.b64decode(value[1]))
+
+class KVCheckpointStore(CheckpointStore):
+    """Shared store on Redis hashes, so any worker can resume any session.
+
+    Per thread: one hash of checkpoints and one of writes, both expiring after
+    `ttl_seconds` without activity. A sorted set tracks last activity per thread.
+    """
+
+    THREADS_KEY = "lg:threads"
+
+    def __init__(self, client, ttl_seconds: Optional[float] = None):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _cp_key(thread_id: str) -> str:
+        return f"lg:cp:{thread_id}"
+
+    @staticmethod
+    def _wr_key(thread_id: str) -> str:
+        return f"lg:wr:{thread_id}"
+
+    def _touch(self, thread_id: str):
+        self.client.zadd(self.THREADS_KEY, {thread_id: time.time()})
+        if self.ttl_seconds:
+            ttl = int(self.ttl_seconds) + 1
+            self.client.expire(self._cp_key(thread_id), ttl)
+            self.client.expire(self._wr_key(thread_id), ttl)
+
+    def put_checkpoint(self, thread_id, row):
+        ns, checkpoint_id, parent_id, checkpoint, metadata = row
+        value = json.dumps([ns, checkpoint_id, parent_id, _pack(checkpoint), _pack(metadata)])
+        self.client.hset(self._cp_key(thread_id), f"{ns}\x00{checkpoint_id}", value)
+        self._touch(thread_id)
+
+    def _rows(self, thread_id: str, checkpoint_ns: Optional[str]) -> List[CheckpointRow]:
+        rows = []
+        for value in self.client.hgetall(self._cp_key(thread_id)).values():
+            ns, checkpoint_id, parent_id, checkpoint, metadata = json.loads(value)
+            if checkpoint_ns is None or ns == checkpoint_ns:
+                rows.append((ns, checkpoint_id, parent_id, _unpack(checkpoint), _unpack(metadata)))
+        rows.sort(key=lambda row: (row[0], row[1]), reverse=True)
+        return rows
+
+    def get_checkpoint(self, thread_id, checkpoint_ns, checkpoint_id):
+        for row in self._rows(thread_id, checkpoint_ns):
+            if not checkpoint_id or row[1] == checkpoint_id:
+                return row
+        return None
+
+    def list_checkpoints(self, thread_id, checkpoint_ns):
+        thread_ids = [thread_id] if thread_id is not None else self.client.zrangebyscore(self.THREADS_KEY, 0, float("inf"))
+        for tid in thread_ids:
+            for row in self._rows(tid, checkpoint_ns):
+                yield tid, row
+
+    def put_writes(self, thread_id, checkpoint_ns, checkpoint_id, writes):
+        key = self._wr_key(thread_id)
+        for task_id, idx, channel, value, task_path in writes:
+            field = f"{checkpoint_ns}\x00{checkpoint_id}\x00{task_id}\x00{idx}"
+            packed = json.dumps([task_id, idx, channel, _pack(value), task_path])
+            if idx < 0:
+                self.client.hset(key, field, packed)
+            else:
+                self.client.hsetnx(key, field, packed)
+        self._touch(thread_id)
+
+    def get_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        prefix = f"{checkpoint_ns}\x00{checkpoint_id}\x00"
+        writes = []
+        for field, value in self.client.hgetall(self._wr_key(thread_id)).items():
+            if field.startswith(prefix):
+                task_id, idx, channel, packed, task_path = json.loads(value)
+                writes.append((task_id, idx, channel, _unpack(packed), task_path))
+        return writes
+
+    def delete_thread(self, thread_id):
+        self.client.delete(self._cp_key(thread_id), self._wr_key(thread_id))
+        self.client.zrem(self.THREADS_KEY, thread_id)
+
+    def prune(self, thread_id, checkpoint_ns, keep):
+        fields = sorted(f for f in self.client.hgetall(self._cp_key(thread_id)) if f.split("\x00")[0] == checkpoint_ns)
+        if len(fields) <= keep:
+            return
+        oldest_kept = fields[-keep].split("\x00")[1]
+        self.client.hdel(self._cp_key(thread_id), *fields[:-keep])
+        stale_writes = [
+            f for f in self.client.hgetall(self._wr_key(thread_id))
+            if f.split("\x00")[0] == checkpoint_ns and f.split("\x00")[1] < oldest_kept
+        ]
+        if stale_writes:
+            self.client.hdel(self._wr_key(thread_id), *stale_writes)
+
+    def expired_threads(self, ttl_seconds):
+        return list(self.client.zrangebyscore(self.THREADS_KEY, 0, time.time() - ttl_seconds))
+
+# --- Checkpointer ---
+
+class StoreCheckpointer(BaseCheckpointSaver[int]):
+    """LangGraph checkpointer on top of a pluggable CheckpointStore.
+
+    Besides the standard API (delete_thread/adelete_thread) it supports
+    TTL-based expiry through expire_threads/aexpire_threads. With
+    `keep_latest`, older checkpoints of a thread are pruned on every put.
+    """
+
+    def __init__(self, store: CheckpointStore, *, serde=None, keep_latest: int = 0):
+        super().__init__(serde=serde)
+        self.store = store
+        self.keep_latest = keep_latest  # 0 = keep full history
+
+    def _tuple(self, thread_id: str, row: CheckpointRow) -> CheckpointTuple:
+        ns, checkpoint_id, parent_id, checkpoint, metadata = row
+        writes = self.store.get_writes(thread_id, ns, checkpoint_id)
+        writes.sort(key=lambda w: writes_sort_key(w[4], w[0], w[1]))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed(checkpoint),
+            metadata=self.serde.loads_typed(metadata),
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value)) for task_id, _, channel, value, _ in writes],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        row = self.store.get_checkpoint(thread_id, checkpoint_ns, get_checkpoint_id(config))
+        return self._tuple(thread_id, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"] if config else None
+        checkpoint_ns = config["configurable"].get("checkpoint_ns") if config else None
+        config_checkpoint_id = get_checkpoint_id(config) if config else None
+        before_id = get_checkpoint_id(before) if before else None
+        for tid, row in self.store.list_checkpoints(thread_id, checkpoint_ns):
+            checkpoint_id = row[1]
+            if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                continue
+            if before_id and checkpoint_id >= before_id:
+                continue
+            if filter:
+                metadata = self.serde.loads_typed(row[4])
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield self._tuple(tid, row)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        self.store.put_checkpoint(thread_id, (
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            self.serde.dumps_typed(checkpoint),
+            self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+        ))
+        if self.keep_latest:
+            self.store.prune(thread_id, checkpoint_ns, self.keep_latest)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        rows = [
+            (task_id, WRITES_IDX_MAP.get(channel, idx), channel, self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        self.store.put_writes(configurable["thread_id"], configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"], rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.store.delete_thread(thread_id)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """Drop old checkpoints: "keep_latest" keeps one per namespace, "delete" removes the threads."""
+        for thread_id in thread_ids:
+            if strategy == "delete":
+                self.store.delete_thread(thread_id)
+                continue
+            namespaces = {row[0] for _, row in self.store.list_checkpoints(thread_id, None)}
+            for checkpoint_ns in namespaces:
+                self.store.prune(thread_id, checkpoint_ns, 1)
+
+    def expire_threads(self, ttl_seconds: float) -> List[str]:
+        """Delete every thread inactive for longer than ttl_seconds and return their IDs."""
+        expired = self.store.expired_threads(ttl_seconds)
+        for thread_id in expired:
+            self.store.delete_thread(thread_id)
+        return expired
+
+    # Async variants run the (blocking) store calls off the event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+    async def aexpire_threads(self, ttl_seconds: float) -> List[str]:
+        return await asyncio.to_thread(self.expire_threads, ttl_seconds)
+
+def build_checkpointer() -> StoreCheckpointer:
+    """Create the checkpointer selected by CHECKPOINT_BACKEND ("sqlite" or "redis")."""
+    settings = get_settings()
+    if settings.CHECKPOINT_BACKEND == "redis":
+        if settings.CHECKPOINT_REDIS_URL:
+            import redis
+            client = redis.Redis.from_url(settings.CHECKPOINT_REDIS_URL, decode_responses=True)
+        else:
+            print("CHECKPOINT_REDIS_URL not set, using the in-process stand-in (single worker only).")
+            client = LocalKV()
+        store = KVCheckpointStore(client, ttl_seconds=settings.SESSION_TTL_SECONDS)
+    else:
+        store = SQLiteCheckpointStore(resolve_path(settings.CHECKPOINT_SQLITE_PATH))
+    return StoreCheckpointer(store, keep_latest=settings.CHECKPOINT_KEEP_LATEST)
@@ -1,26 +1,13 @@
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-
-from app.services.agent.state import AgentState
-from app.services.agent.nodes.classifier import classify_intent_node
-from app.services.agent.nodes.retriever import retrieve_node
-from app.services.agent.nodes.generator import generate_node, direct_response_node
-from app.services.agent.nodes.learner import learner_node, learner_save_node
+from app.core.lazy import Lazy
+from app.core.metrics import INTENTS, instrument_node
+from app.core.tracing import traced
 
 # --- Graph Construction ---
 
-workflow = StateGraph(AgentState)
-
-workflow.add_node("classifier", classify_intent_node)
-workflow.add_node("retriever", retrieve_node)
-workflow.add_node("generator", generate_node)
-workflow.add_node("direct_response", direct_response_node)
-workflow.add_node("learner", learner_node)
-workflow.add_node("learner_save", learner_save_node)
-
-def should_retrieve(state: AgentState):
+def should_retrieve(state):
     """Route based on intent."""
     intent = state.get("user_intent", "technical")
+    INTENTS.labels(intent).inc()
     if intent == "learner_confirmation":
         return "learner_save"
     elif intent == "technical":
@@ -33,23 +20,57 @@ def should_retrieve(state: AgentState):
     else:
         return "direct_response"
 
-workflow.set_entry_point("classifier")
-workflow.add_conditional_edges(
-    "classifier",
-    should_retrieve,
-    {
-        "retriever": "retriever",
-        "direct_response": "direct_response",
-        "learner_save": "learner_save",
-        "generator": "generator"
+def build_graph():
+    """Compile the agent graph with its checkpointer.
+
+    LangGraph, the nodes and the checkpoint store are imported and opened here,
+    not at module import, so starting the app stays cheap (see `app` below).
+    """
+    from langgraph.graph import StateGraph, END
+    from app.services.agent.state import AgentState
+    from app.services.agent.nodes.classifier import classify_intent_node
+    from app.services.agent.nodes.retriever import retrieve_node
+    from app.services.agent.nodes.generator import generate_node, direct_response_node
+    from app.services.agent.nodes.learner import learner_node, learner_save_node
+    from app.services.agent.nodes.compactor import compact_node
+    from app.services.agent.checkpoint import build_checkpointer
+
+    workflow = StateGraph(AgentState)
+
+    nodes = {
+        "classifier": classify_intent_node,
+        "retriever": retrieve_node,
+        "generator": generate_node,
+        "direct_response": direct_response_node,
+        "learner": learner_node,
+        "learner_save": learner_save_node,
+        "compactor": compact_node,
     }
-)
-workflow.add_edge("retriever", "generator")
-workflow.add_edge("generator", "learner")
-workflow.add_edge("learner", END)
-workflow.add_edge("learner_save", END)
-workflow.add_edge("direct_response", END)
-
-# Add Persistence
-memory = MemorySaver()
-app = workflow.compile(checkpointer=memory)
+    for name, node in nodes.items():
+        # Every node reports its latency on /metrics and opens a span in the request trace
+        workflow.add_node(name, instrument_node(name, traced(name, "node")(node)))
+
+    workflow.set_entry_point("classifier")
+    workflow.add_conditional_edges(
+        "classifier",
+        should_retrieve,
+        {
+            "retriever": "retriever",
+            "direct_response": "direct_response",
+            "learner_save": "learner_save",
+            "generator": "generator"
+        }
+    )
+    workflow.add_edge("retriever", "generator")
+    workflow.add_edge("generator", "learner")
+    workflow.add_edge("learner", "compactor")
+    workflow.add_edge("learner_save", "compactor")
+    workflow.add_edge("direct_response", "compactor")
+    workflow.add_edge("compactor", END)
+
+    # Add Persistence (durable, shared across workers)
+    memory = build_checkpointer()
+    return workflow.compile(checkpointer=memory)
+
+# Compiled on first use or during warm-up (app.main lifespan)
+app = Lazy(build_graph, "Agent graph")
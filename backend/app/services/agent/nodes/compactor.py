@@ -0,0 +1,42 @@
+import re
+from langchain_core.messages import HumanMessage, RemoveMessage
+from app.services.agent.state import AgentState
+from app.core.config import get_settings
+
+# The classifier needs the last AI message plus the query before it
+MIN_MESSAGE_WINDOW = 4
+
+_CODE_BLOCK_RE = re.compile(r"```.*?(```|$)", re.DOTALL)
+
+def condense(text: str, max_chars: int) -> str:
+    """One-line gist of a message: code blocks and the learner prompt dropped, whitespace collapsed."""
+    text = text.split("\n---\n")[0]
+    text = _CODE_BLOCK_RE.sub(" [code] ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+def fold_into_summary(summary: str, messages, line_chars: int, max_chars: int) -> str:
+    """Append condensed messages to the rolling summary, dropping its oldest lines past max_chars."""
+    lines = summary.splitlines() if summary else []
+    for msg in messages:
+        role = "User" if isinstance(msg, HumanMessage) else "Assistant"
+        lines.append(f"{role}: {condense(str(msg.content), line_chars)}")
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+def compact_node(state: AgentState):
+    """Keep a bounded message window; older turns are folded into `summary`."""
+    settings = get_settings()
+    messages = state["messages"]
+    window = max(settings.MESSAGE_WINDOW, MIN_MESSAGE_WINDOW)
+    if len(messages) <= window:
+        return {}
+
+    folded = messages[:len(messages) - window]
+    return {
+        "messages": [RemoveMessage(id=msg.id) for msg in folded],
+        "summary": fold_into_summary(
+            state.get("summary", ""), folded, settings.SUMMARY_LINE_CHARS, settings.SUMMARY_MAX_CHARS
+        )
+    }
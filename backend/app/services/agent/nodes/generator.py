@@ -1,6 +1,10 @@
 from langchain_core.messages import HumanMessage, AIMessage
 from app.services.agent.state import AgentState
 from app.services.agent.utils import get_llm
+from app.services.answer_cache import answer_cache
+from app.core.firebase import firebase_client
+from app.core.config import get_settings
+from app.services.context_packer import pack_context
 from app.services.agent.prompts import (
     GENERATION_PROMPT_KB, 
     GENERATION_PROMPT_GENERAL, 
@@ -8,27 +12,44 @@ from app.services.agent.prompts import (
     GENERAL_CHAT_PROMPT
 )
 
-def generate_node(state: AgentState):
+async def generate_node(state: AgentState):
     """Generate response using KB or general knowledge."""
     query = state["messages"][-1].content
     docs = state.get("context_docs", [])
     llm = get_llm()
     
-    context_str = ""
-    source_ids = []
+    settings = get_settings()
     
-    if docs:
-        for doc in docs:
-            source_ids.append(doc['id'])
-            context_str += f"\n--- Document (ID: {doc['id']}, Status: {doc.get('status', 'unverified')}) ---\n"
-            context_str += f"Title: {doc['title']}\nContent:\n{doc.get('content', '')}\n"
-            if doc.get('status') == 'unverified':
-                context_str += "⚠️ WARNING: THIS DOCUMENT IS UNVERIFIED.\n"
+    # Best-matching chunks of the retrieved docs, within the token budget;
+    # source_ids only lists docs that actually made it into the prompt
+    context_str, source_ids = pack_context(query, docs, settings.CONTEXT_TOKEN_BUDGET, settings.CHUNK_TOKENS)
     
-    has_kb_context = len(docs) > 0
+    has_kb_context = len(source_ids) > 0
+
+    # Technical questions that open a conversation can be answered from the cache.
+    # Later turns are generated with this thread's history and summary, so their
+    # answers must neither come from nor go to a cache shared across sessions.
+    first_turn = len(state["messages"]) == 1 and not state.get("summary")
+    cacheable = settings.ANSWER_CACHE_ENABLED and state.get("user_intent") == "technical" and first_turn
+    kb_version = firebase_client.kb_version
+    if cacheable:
+        cached = await answer_cache.get(query, source_ids, kb_version)
+        if cached is not None:
+            return {
+                "answer": cached,
+                "messages": [AIMessage(content=cached)],
+                "used_kb": has_kb_context,
+                "source_ids": source_ids,
+                "needs_learning": not has_kb_context,
+                "previous_query": query,
+                "previous_answer": cached,
+                "cache_hit": True
+            }
     
     # Build conversation history context
     history_context = ""
+    if state.get("summary"):
+        history_context += f"(Earlier in this conversation)\n{state['summary']}\n\n"
     start_idx = max(0, len(state["messages"]) - 6)
     for msg in state["messages"][start_idx:-1]:
         role = "User" if isinstance(msg, HumanMessage) else "Assistant"
@@ -46,8 +67,11 @@ def generate_node(state: AgentState):
             query=query
         )
     
-    response = llm.invoke(prompt)
+    response = await llm.ainvoke(prompt)
     answer_content = response.content
+
+    if cacheable and answer_content:
+        await answer_cache.put(query, source_ids, kb_version, answer_content)
     
     return {
         "answer": answer_content,
@@ -56,10 +80,11 @@ def generate_node(state: AgentState):
         "source_ids": source_ids,
         "needs_learning": not has_kb_context or state.get("user_intent") == "correction",
         "previous_query": query,
-        "previous_answer": answer_content
+        "previous_answer": answer_content,
+        "cache_hit": False
     }
 
-def direct_response_node(state: AgentState):
+async def direct_response_node(state: AgentState):
     """Handle greetings and general conversation."""
     query = state["messages"][-1].content
     intent = state.get("user_intent", "general_chat")
@@ -70,5 +95,5 @@ def direct_response_node(state: AgentState):
     else:
         prompt = GENERAL_CHAT_PROMPT.format(query=query)
     
-    response = llm.invoke(prompt)
+    response = await llm.ainvoke(prompt)
     return {"answer": response.content, "messages": [AIMessage(content=response.content)]}
@@ -1,13 +1,15 @@
+import asyncio
 from langchain_core.messages import AIMessage
 from datetime import datetime
 from app.services.agent.state import AgentState
 from app.services.agent.prompts import (
     LEARNER_PROMPT_TEMPLATE, 
     LEARNER_PROMPT_CORRECTION, 
-    LEARNER_SAVE_SUCCESS
+    LEARNER_SAVE_PENDING
 )
 from app.services.extractor import extractor
 from app.core.firebase import firebase_client
+from app.services.jobs import job_queue
 
 def learner_node(state: AgentState):
     """Ask user if the general knowledge answer worked."""
@@ -37,8 +39,29 @@ def learner_node(state: AgentState):
         "learner_asked": True
     }
 
+async def persist_learned_answer(doc_id: str, query: str, answer: str) -> dict:
+    """Background job: clean the answer, extract metadata and write the KB document."""
+    # Independent LLM steps run concurrently; metadata uses the query + raw answer for context
+    content, metadata = await asyncio.gather(
+        extractor.clean_kb_content(answer),
+        extractor.extract_metadata(f"Query: {query}\nAnswer: {answer}", raise_errors=True)
+    )
+
+    # SAVE only the cleansed answer to keep the KB clean
+    await firebase_client.aadd_document({
+        "title": metadata.title,
+        "content": content,
+        "tags": metadata.tags,
+        "type": "text",
+        "summary": metadata.summary,
+        "status": "unverified",
+        "ai_created": True,
+        "created_at": datetime.now().isoformat()
+    }, doc_id=doc_id)
+    return {"doc_id": doc_id, "title": metadata.title, "tags": metadata.tags}
+
 async def learner_save_node(state: AgentState):
-    """Auto-save confirmed answer to KB."""
+    """Queue the confirmed answer for saving to the KB and acknowledge right away."""
     previous_query = state.get("previous_query", "")
     previous_answer = state.get("previous_answer", "")
     
@@ -53,39 +76,17 @@ async def learner_save_node(state: AgentState):
         clean_answer = clean_answer.split("\n---\n")[0].strip()
     elif "---" in clean_answer and "💡 Learner Agent" in clean_answer:
         clean_answer = clean_answer.split("---")[0].strip()
-        
-    # Use AI to intelligently clean the content
-    clean_answer = await extractor.clean_kb_content(clean_answer)
 
-    # Extract metadata using BOTH query and answer for context
-    extraction_content = f"Query: {previous_query}\nAnswer: {clean_answer}"
-    
-    # But SAVE only the cleansed answer to keep the KB clean
-    content = clean_answer
-    
     try:
-        metadata = await extractor.extract_metadata(extraction_content)
-        
-        # Use extracted summary as requested
-        summary = metadata.summary
-        
-        doc_id = firebase_client.add_document({
-            "title": metadata.title,
-            "content": content,
-            "tags": metadata.tags,
-            "type": "text",
-            "summary": summary,
-            "status": "unverified",
-            "ai_created": True,
-            "created_at": datetime.now().isoformat()
-        })
-        
-        save_response = LEARNER_SAVE_SUCCESS.format(
-            doc_id=doc_id,
-            title=metadata.title,
-            tags=', '.join(metadata.tags)
+        doc_id = firebase_client.new_document_id()
+        if not doc_id:
+            raise RuntimeError("Knowledge Base is not configured")
+        job = job_queue.submit(
+            "learner_save",
+            lambda: persist_learned_answer(doc_id, previous_query, clean_answer),
+            doc_id=doc_id
         )
-        
+        save_response = LEARNER_SAVE_PENDING.format(doc_id=doc_id, job_id=job.id)
         return {
             "answer": save_response,
             "messages": [AIMessage(content=save_response)],
@@ -1,32 +1,69 @@
 import json
+from typing import List, Dict, Any
 from app.services.agent.state import AgentState
 from app.services.agent.utils import get_llm
+from app.core.admission import Overloaded
 from app.services.agent.prompts import RETRIEVAL_PROMPT
 from app.core.firebase import firebase_client
+from app.core.config import get_settings
+from app.services.search import kb_search_index
+from app.services.vector_store import kb_vector_index
+from app.services.answer_cache import normalize_query
+from app.core.singleflight import single_flight
 
-def retrieve_node(state: AgentState):
-    """Fetch KB documents using semantic matching."""
-    query = state["messages"][-1].content
-    index = firebase_client.fetch_index()
-    llm = get_llm()
-    
-    if not index:
-        return {"context_docs": []}
+async def select_by_llm(query: str, index: List[Dict[str, Any]]) -> List[str]:
+    """Let Gemini pick document IDs from a BM25 shortlist of the index."""
+    settings = get_settings()
+
+    # Only a bounded BM25 shortlist goes into the prompt
+    candidates = kb_search_index.shortlist(query, index, settings.RETRIEVAL_CANDIDATE_LIMIT)
+    if not candidates:
+        return []
 
     index_str = "\n".join([
         f"ID: {item['id']}\nTitle: {item['title']}\nTags: {', '.join(item['tags']) if item['tags'] else 'none'}\nSummary: {item.get('summary', 'N/A')}\n"
-        for item in index
+        for item in candidates
     ])
-    
+
+    llm = get_llm()
     try:
-        response = llm.invoke(RETRIEVAL_PROMPT.format(query=query, index_str=index_str))
+        response = await llm.ainvoke(RETRIEVAL_PROMPT.format(query=query, index_str=index_str))
         content = response.content.replace("```json", "").replace("```", "").strip()
         selected_ids = json.loads(content)
         if not isinstance(selected_ids, list):
             selected_ids = []
+    except Overloaded:
+        raise
     except Exception as e:
         print(f"Retrieval error: {e}")
         selected_ids = []
-        
-    full_docs = firebase_client.fetch_documents(selected_ids)
+    return selected_ids[:settings.RETRIEVAL_TOP_K]
+
+async def select_by_vector(query: str) -> List[str]:
+    """Pick document IDs by embedding similarity, no LLM call."""
+    settings = get_settings()
+    try:
+        matches = await kb_vector_index.asearch(query, settings.RETRIEVAL_TOP_K)
+    except Exception as e:
+        print(f"Vector retrieval error: {e}")
+        return []
+    return [doc_id for doc_id, score in matches if score >= settings.VECTOR_MIN_SCORE]
+
+async def retrieve_node(state: AgentState):
+    """Fetch KB documents using semantic matching."""
+    query = state["messages"][-1].content
+    index = await firebase_client.afetch_index()
+
+    if not index:
+        return {"context_docs": []}
+
+    # Identical questions asked at the same time share one selection
+    strategy = get_settings().RETRIEVAL_STRATEGY
+    key = ("retrieval", strategy, normalize_query(query), firebase_client.kb_version)
+    if strategy == "vector":
+        selected_ids = await single_flight.do(key, lambda: select_by_vector(query))
+    else:
+        selected_ids = await single_flight.do(key, lambda: select_by_llm(query, index))
+
+    full_docs = await firebase_client.afetch_documents(selected_ids)
     return {"context_docs": full_docs}
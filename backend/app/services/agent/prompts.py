@@ -1,41 +1,35 @@
-CORRECTION_PROMPT = """
+CLASSIFICATION_PROMPT = """
+Classify the user's latest message for a Hybris/SAP Commerce assistant.
+{history_section}
 User Message: "{query}"
 
-Is the user providing a CORRECTION or IMPROVEMENT to the PREVIOUS code/answer?
-Key distinctions:
-- "Fix the join" -> YES (Correction)
-- "This code is wrong" -> YES (Correction)
-- "Save this" -> YES (Correction/Feedback)
-- "Start a new query" -> NO (New Request)
-- "How do I..." -> NO (New Request)
-- "Give me a query for..." -> NO (New Request)
-
-Answer ONLY: yes or no
-"""
-
-CONFIRMATION_PROMPT = """
-The user was asked if a general knowledge answer worked for them.
-User's response: "{query}"
-
-Is the user confirming that the answer worked/was correct/helpful?
-Confirmations: "yes", "correct", "worked", "it worked", "that's right", "perfect", "yes it's correct", etc.
-
-Answer ONLY: yes or no
-"""
-
-INTENT_CLASSIFICATION_PROMPT = """
-Classify this user message into ONE intent:
+1. intent - exactly ONE of:
 - greeting: Simple greetings, pleasantries, thanking
 - general_chat: General conversation, small talk, vague questions
 - clarification: Clarify previous response or follow-up questions
 - correction: User is correcting the agent or providing an improved solution to remember
 - technical: Hybris, SAP Commerce, FlexSearch, Impex, Groovy, technical solutions
 
-User Message: "{query}"
+2. is_correction - is the user providing a CORRECTION or IMPROVEMENT to the PREVIOUS code/answer?
+- "Fix the join" -> true
+- "This code is wrong" -> true
+- "Save this" -> true
+- "Start a new query" -> false
+- "How do I..." -> false
+- "Give me a query for..." -> false
+
+3. is_confirmation - {confirmation_instruction}
 
-Return only one word: greeting, general_chat, clarification, correction, or technical
+Output ONLY valid JSON, no markdown:
+{{"intent": "technical", "is_correction": false, "is_confirmation": false}}
 """
 
+CONFIRMATION_INSTRUCTION = """the assistant asked if its general knowledge answer worked. Is the user confirming that the answer worked/was correct/helpful?
+Confirmations: "yes", "correct", "worked", "it worked", "that's right", "perfect", "yes it's correct", "save it", etc.
+If this is true, is_correction is false."""
+
+NO_CONFIRMATION_INSTRUCTION = "always false (no confirmation was requested)."
+
 RETRIEVAL_PROMPT = """
 You are a semantic search expert for Hybris/SAP Commerce queries.
 
@@ -173,22 +167,15 @@ I noticed you provided a correction or improvement! 🧠
 Reply "yes" or "save it" to confirm.
 """
 
-LEARNER_SAVE_SUCCESS = """
-✅ **Great! I've saved this to the Knowledge Base.**
+LEARNER_SAVE_PENDING = """
+✅ **Great! I'm saving this to the Knowledge Base.**
 
-**Document Details:**
-- **ID:** {doc_id}
-- **Title:** {title}
-- **Tags:** {tags}
-- **Status:** Unverified
+**Document ID:** {doc_id} (Status: Unverified)
 
 [Source: {doc_id}]
 
-**To edit or verify this document:**
-1. Go to the **Knowledge Base** tab
-2. Find the document (it will have a 🤖 "Added by AI" badge)
-3. Click **Edit** to modify title, summary, tags, or content
-4. Click **Verify** if the content is accurate
-
-This will help improve future responses! 🎉
+The title, tags and summary are being generated in the background.
+You can check progress at `/api/jobs/{job_id}`; the document shows up
+in the **Knowledge Base** tab with a 🤖 "Added by AI" badge once it's done.
 """
+
@@ -13,3 +13,5 @@ class AgentState(TypedDict):
     learner_asked: bool
     previous_query: str
     previous_answer: str
+    cache_hit: bool
+    summary: str
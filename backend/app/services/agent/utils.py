@@ -1,10 +1,5 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.core.config import get_settings
+from app.core.llm import llm_registry
 
 def get_llm():
-    settings = get_settings()
-    return ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash", 
-        temperature=0,
-        google_api_key=settings.GEMINI_API_KEY
-    )
+    """Shared chat model for the agent nodes (see app/core/llm.py)."""
+    return llm_registry.get("default")
@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.core.firebase import firebase_client
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    doc_ids: Tuple[str, ...]
+    created_at: float
+    embedding: Optional[np.ndarray] = None
+
+class AnswerCache:
+    """LRU/TTL cache of generated answers.
+
+    Keyed by normalized query + retrieved document IDs + KB version. With an
+    embedder and a similarity threshold, near-duplicate queries over the same
+    documents also hit. Entries citing a document are dropped when it is
+    updated or deleted.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.0, embedder=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, CachedAnswer]" = OrderedDict()
+        self._by_doc: Dict[str, set] = {}
+        self._by_docs_version: Dict[Tuple, set] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(query: str, doc_ids: List[str], kb_version: int) -> Tuple:
+        return (normalize_query(query), tuple(sorted(doc_ids)), kb_version)
+
+    @property
+    def semantic(self) -> bool:
+        return self.embedder is not None and self.similarity_threshold > 0
+
+    async def _embed(self, query: str) -> np.ndarray:
+        text = normalize_query(query)
+        if hasattr(self.embedder, "aembed_query"):
+            vector = await self.embedder.aembed_query(text)
+        else:
+            vector = self.embedder.embed_query(text)
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def get(self, query: str, doc_ids: List[str], kb_version: int) -> Optional[str]:
+        key = self._key(query, doc_ids, kb_version)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry.answer
+            if not self.semantic or not self._by_docs_version.get(key[1:]):
+                self.misses += 1
+                return None
+
+        # Near-duplicate match among answers over the same documents
+        embedding = await self._embed(query)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for other_key in list(self._by_docs_version.get(key[1:], ())):
+                other = self._lookup(other_key, touch=False)
+                if other is None or other.embedding is None:
+                    continue
+                score = float(other.embedding @ embedding)
+                if score >= best_score:
+                    best_key, best_score = other_key, score
+            if best_key is not None:
+                self.hits += 1
+                return self._lookup(best_key).answer
+            self.misses += 1
+            return None
+
+    async def put(self, query: str, doc_ids: List[str], kb_version: int, answer: str):
+        key = self._key(query, doc_ids, kb_version)
+        embedding = await self._embed(query) if self.semantic else None
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = CachedAnswer(answer, key[1], time.time(), embedding)
+            for doc_id in key[1]:
+                self._by_doc.setdefault(doc_id, set()).add(key)
+            self._by_docs_version.setdefault(key[1:], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_doc(self, doc_id: str):
+        """Drop every cached answer that cites doc_id."""
+        with self._lock:
+            for key in list(self._by_doc.get(doc_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_doc.clear()
+            self._by_docs_version.clear()
+
+    def on_kb_change(self, event: str, doc_id: Optional[str], data: Optional[Dict[str, Any]]):
+        """FirebaseClient listener hook."""
+        if event in ("update", "delete") or (event == "upsert" and doc_id in self._by_doc):
+            self.invalidate_doc(doc_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _lookup(self, key: Tuple, touch: bool = True) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.created_at > self.ttl_seconds:
+            self._drop(key)
+            self.evictions += 1
+            return None
+        if touch:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _drop(self, key: Tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for doc_id in entry.doc_ids:
+            keys = self._by_doc.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_doc[doc_id]
+        group = self._by_docs_version.get(key[1:])
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._by_docs_version[key[1:]]
+
+def _build_cache() -> AnswerCache:
+    settings = get_settings()
+    embedder = None
+    if settings.ANSWER_CACHE_SIMILARITY > 0:
+        from app.services.vector_store import make_embedder
+        embedder = make_embedder(settings.EMBEDDING_BACKEND)
+    return AnswerCache(
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+        embedder=embedder
+    )
+
+# Singleton instance, invalidated by KB writes through FirebaseClient
+answer_cache = _build_cache()
+firebase_client.subscribe(answer_cache.on_kb_change)
@@ -0,0 +1,86 @@
+import math
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+from app.core.chunking import document_chunks, estimate_tokens
+from app.services.search import tokenize
+
+@dataclass
+class Chunk:
+    doc_rank: int  # Position of the parent document in the retrieval result
+    position: int  # Position of the chunk in its document
+    text: str
+    tokens: int
+    score: float = 0.0
+
+def doc_header(doc: Dict[str, Any]) -> str:
+    header = f"\n--- Document (ID: {doc['id']}, Status: {doc.get('status', 'unverified')}) ---\n"
+    header += f"Title: {doc.get('title', '')}\n"
+    if doc.get('status') == 'unverified':
+        header += "⚠️ WARNING: THIS DOCUMENT IS UNVERIFIED.\n"
+    return header + "Content:\n"
+
+def score_chunks(query: str, chunks: List[Chunk], k1: float = 1.2, b: float = 0.75):
+    """BM25 over the candidate chunks, plus a small prior for better-ranked documents and early chunks."""
+    query_terms = set(tokenize(query))
+    term_counts = [Counter(tokenize(chunk.text)) for chunk in chunks]
+    avg_len = sum(sum(c.values()) for c in term_counts) / max(len(chunks), 1) or 1.0
+    doc_freq = Counter(term for counts in term_counts for term in counts if term in query_terms)
+    for chunk, counts in zip(chunks, term_counts):
+        length = sum(counts.values())
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(chunks) - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        chunk.score = score + 0.1 / (1 + chunk.doc_rank) + 0.05 / (1 + chunk.position)
+
+def pack_context(query: str, docs: List[Dict[str, Any]], budget_tokens: int, chunk_tokens: int) -> Tuple[str, List[str]]:
+    """Fill the token budget with the best-matching chunks of the retrieved documents.
+
+    Returns the rendered context and the IDs of the documents that made it in,
+    so `[Source: doc_id]` citations only name documents the model actually saw.
+    Selected chunks are rendered per document in their original order, with
+    `[...]` marking skipped parts.
+    """
+    chunks = []
+    for rank, doc in enumerate(docs):
+        # A document without content still contributes its header (ID, title, status)
+        texts = document_chunks(doc, chunk_tokens) or [""]
+        chunks.extend(
+            Chunk(doc_rank=rank, position=position, text=text, tokens=estimate_tokens(text))
+            for position, text in enumerate(texts)
+        )
+    if not chunks:
+        return "", []
+    score_chunks(query, chunks)
+
+    used = 0
+    selected: Dict[int, List[Chunk]] = {}
+    for chunk in sorted(chunks, key=lambda c: c.score, reverse=True):
+        cost = chunk.tokens
+        if chunk.doc_rank not in selected:
+            cost += estimate_tokens(doc_header(docs[chunk.doc_rank]))
+        if used + cost > budget_tokens:
+            continue
+        selected.setdefault(chunk.doc_rank, []).append(chunk)
+        used += cost
+
+    context_str = ""
+    source_ids = []
+    # Chunks are cut at line breaks, so consecutive ones join back into the original text
+    for rank in sorted(selected):
+        doc = docs[rank]
+        source_ids.append(doc['id'])
+        context_str += doc_header(doc)
+        previous = -1
+        for chunk in sorted(selected[rank], key=lambda c: c.position):
+            if chunk.position != previous + 1:
+                context_str += ("" if context_str.endswith("\n") else "\n") + "[...]\n"
+            context_str += chunk.text
+            previous = chunk.position
+        if not context_str.endswith("\n"):
+            context_str += "\n"
+    return context_str, source_ids
@@ -1,21 +1,31 @@
-import os
-import google.generativeai as genai
 from app.models.schemas import ExtractResponse
+import hashlib
 import json
-from app.core.config import get_settings
+from app.core.llm import llm_registry
+from app.core.singleflight import single_flight
+from app.core.lazy import Lazy
+from app.core.metrics import EXTRACTOR_SECONDS, timed
+from app.core.tracing import traced
 
 class AIExtractor:
     def __init__(self):
-        api_key = get_settings().GEMINI_API_KEY
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
-        else:
-            self.model = None
+        if not llm_registry.available():
             print("Warning: GEMINI_API_KEY not found.")
 
-    async def extract_metadata(self, text: str) -> ExtractResponse:
+    @property
+    def model(self):
+        """Shared "extractor" chat model, or None when no backend is configured."""
+        if not llm_registry.available():
+            return None
+        return llm_registry.get("extractor")
+
+    @timed(EXTRACTOR_SECONDS, "extract_metadata")
+    @traced("extractor.extract_metadata", "extractor")
+    async def extract_metadata(self, text: str, raise_errors: bool = False) -> ExtractResponse:
+        """Title/tags/summary for a snippet. Failures return an "Error" response unless raise_errors is set."""
         if not self.model:
+            if raise_errors:
+                raise RuntimeError("Backend not configured")
             return ExtractResponse(title="Error", tags=["No API Key"], summary="Backend not configured")
 
         prompt = f"""
@@ -41,10 +51,10 @@ class AIExtractor:
         }}
         """
         
-        try:
-            response = self.model.generate_content(prompt)
+        async def run() -> ExtractResponse:
+            response = await self.model.ainvoke(prompt)
             # Basic cleanup if the model returns markdown code blocks
-            content = response.text.replace("```json", "").replace("```", "").strip()
+            content = response.content.replace("```json", "").replace("```", "").strip()
             data = json.loads(content)
             
             # Clean up tags - remove # prefix if present
@@ -52,10 +62,20 @@ class AIExtractor:
                 data["tags"] = [tag.lstrip('#').strip() for tag in data["tags"]]
             
             return ExtractResponse(**data)
+
+        try:
+            # Identical snippets extracted at the same time share one LLM call
+            key = ("extract", hashlib.sha1(text.encode()).hexdigest())
+            result = await single_flight.do(key, run)
+            return result.model_copy(deep=True)
         except Exception as e:
             print(f"Extraction error: {e}")
+            if raise_errors:
+                raise
             return ExtractResponse(title="Error", tags=[], summary=str(e))
 
+    @timed(EXTRACTOR_SECONDS, "clean_kb_content")
+    @traced("extractor.clean_kb_content", "extractor")
     async def clean_kb_content(self, text: str) -> str:
         """Clean conversational text to extract knowledge-base ready content."""
         if not self.model:
@@ -79,10 +99,11 @@ class AIExtractor:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            response = await self.model.ainvoke(prompt)
+            return response.content.strip()
         except Exception as e:
             print(f"Cleaning error: {e}")
             return text
 
-extractor = AIExtractor()
+# Built on first use or during warm-up (app.main lifespan)
+extractor = Lazy(AIExtractor, "AI extractor")
@@ -0,0 +1,114 @@
+import asyncio
+import contextvars
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import get_settings
+from app.core.admission import llm_priority
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str = "pending"  # pending -> running -> done | failed
+    ref: Dict[str, Any] = field(default_factory=dict)  # e.g. the doc ID the job will write
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            **self.ref,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobQueue:
+    """In-process background job queue with a fixed pool of asyncio workers.
+
+    Finished jobs are kept (up to `history`) so their status can be polled.
+    Workers start lazily on the first submit, inside the running event loop,
+    in a fresh context: they must not inherit the submitting request's
+    session, and their LLM calls are admitted at background priority.
+    """
+
+    def __init__(self, workers: int = 2, history: int = 1000):
+        self.workers = workers
+        self.history = history
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._funcs: Dict[str, Callable[[], Awaitable[Any]]] = {}
+
+    def submit(self, kind: str, func: Callable[[], Awaitable[Any]], **ref) -> Job:
+        """Queue `func` (an async callable taking no arguments) and return its job record."""
+        self._ensure_workers()
+        job = Job(id=uuid.uuid4().hex, kind=kind, ref=ref)
+        self._jobs[job.id] = job
+        self._funcs[job.id] = func
+        self._trim()
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        counts = {"queued": self._queue.qsize() if self._queue else 0}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(contextvars.Context().run(asyncio.create_task, self._worker()))
+
+    async def shutdown(self):
+        """Stop the workers; queued jobs that have not started are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        llm_priority.set("background")
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            func = self._funcs.pop(job_id, None)
+            if job is None or func is None:
+                continue
+            job.status = "running"
+            try:
+                job.result = await func()
+                job.status = "done"
+            except Exception as e:
+                print(f"Job {job.kind}/{job.id} failed: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            job.finished_at = time.time()
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond the history limit
+        excess = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in ("done", "failed"):
+                del self._jobs[job_id]
+                excess -= 1
+
+# Singleton instance
+_settings = get_settings()
+job_queue = JobQueue(workers=_settings.JOB_WORKERS, history=_settings.JOB_HISTORY)
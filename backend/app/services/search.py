@@ -0,0 +1,198 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Any, Optional, Tuple
+from app.core.firebase import firebase_client
+
+# Field weights for the BM25 term frequencies (title/tags matter most)
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 3.0,
+    "summary": 2.0,
+    "content": 1.0,
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "be", "by", "can", "do", "does", "for", "from", "get",
+    "give", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "query",
+    "show", "that", "the", "this", "to", "using", "want", "what", "which", "with", "write",
+}
+
+# Common spellings of Hybris concepts mapped to a single keyword
+SYNONYMS = {
+    "flexiblesearch": "flexsearch",
+    "flexible": "flexsearch",
+    "flex": "flexsearch",
+    "fs": "flexsearch",
+    "impexp": "impex",
+    "hmc": "backoffice",
+    "table": "itemtype",
+    "tables": "itemtype",
+    "type": "itemtype",
+    "types": "itemtype",
+}
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9_]*|\d+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_FLEXSEARCH_RE = re.compile(r"\bselect\b.*?\bfrom\s*\{", re.IGNORECASE | re.DOTALL)
+_IMPEX_RE = re.compile(r"^\s*(INSERT_UPDATE|INSERT|UPDATE|REMOVE)\s+\w+\s*;", re.IGNORECASE | re.MULTILINE)
+_GROOVY_RE = re.compile(r"\b(flexibleSearchService|modelService|spring\.getBean|def\s+\w+\s*=)")
+
+def _normalize(token: str) -> str:
+    token = token.lower()
+    token = SYNONYMS.get(token, token)
+    # Light plural stemming: orders -> order, categories -> category
+    if len(token) > 4 and token.endswith("ies"):
+        token = token[:-3] + "y"
+    elif len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us")):
+        token = token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Hybris-aware tokenizer.
+
+    Splits item type names and attributes written in camel case or snake case
+    (ProductModel -> productmodel, product, model), strips FlexSearch braces and
+    aliases (`{p:code}` -> code) and maps common spellings to one keyword.
+    """
+    if not text:
+        return []
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        parts = [p for chunk in word.split("_") for p in _CAMEL_RE.findall(chunk)]
+        candidates = [word] + (parts if len(parts) > 1 else [])
+        for candidate in candidates:
+            if len(candidate) < 2:
+                continue
+            token = _normalize(candidate)
+            if token and token not in STOPWORDS:
+                tokens.append(token)
+    return tokens
+
+def hybris_keywords(text: str) -> List[str]:
+    """Detect the snippet language so 'flexsearch'/'impex'/'groovy' queries match code-only docs."""
+    if not text:
+        return []
+    keywords = []
+    if _FLEXSEARCH_RE.search(text):
+        keywords.append("flexsearch")
+    if _IMPEX_RE.search(text):
+        keywords.append("impex")
+    if _GROOVY_RE.search(text):
+        keywords.append("groovy")
+    return keywords
+
+class KBSearchIndex:
+    """In-process inverted index with BM25 scoring over title, tags, summary and content."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._field_tokens: Dict[str, Dict[str, List[str]]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._total_len = 0.0
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def on_kb_change(self, event: str, doc_id: Optional[str], data: Optional[Dict[str, Any]]):
+        """FirebaseClient listener hook."""
+        if event == "reset":
+            self.clear()
+        elif event == "delete":
+            self.remove(doc_id)
+        elif event == "update":
+            self.upsert(doc_id, data, partial=True)
+        elif event == "upsert":
+            self.upsert(doc_id, data)
+
+    def clear(self):
+        with self._lock:
+            self._field_tokens.clear()
+            self._doc_len.clear()
+            self._postings.clear()
+            self._total_len = 0.0
+
+    def upsert(self, doc_id: str, data: Dict[str, Any], partial: bool = False):
+        """Index a document. With partial=True only the supplied fields are re-tokenized."""
+        fields = {}
+        for field in FIELD_WEIGHTS:
+            if field not in data:
+                continue
+            value = data[field]
+            if field == "tags":
+                value = " ".join(value or [])
+            tokens = tokenize(value or "")
+            if field == "content":
+                tokens += hybris_keywords(value or "")
+            fields[field] = tokens
+
+        with self._lock:
+            if partial:
+                if doc_id not in self._field_tokens:
+                    return
+                fields = {**self._field_tokens[doc_id], **fields}
+            self._remove_postings(doc_id)
+            self._field_tokens[doc_id] = fields
+
+            weighted = Counter()
+            for field, tokens in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for token in tokens:
+                    weighted[token] += weight
+            length = sum(weighted.values())
+            for token, tf in weighted.items():
+                self._postings[token][doc_id] = tf
+            self._doc_len[doc_id] = length
+            self._total_len += length
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove_postings(doc_id)
+            self._field_tokens.pop(doc_id, None)
+
+    def _remove_postings(self, doc_id: str):
+        length = self._doc_len.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_len -= length
+        for token in set(t for tokens in self._field_tokens.get(doc_id, {}).values() for t in tokens):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Return up to `limit` (doc_id, score) pairs, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not terms or not n_docs:
+                return []
+            avg_len = self._total_len / n_docs or 1.0
+            scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def shortlist(self, query: str, index: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Bound the index entries sent to the LLM. Small KBs are passed through unchanged."""
+        if len(index) <= limit:
+            return index
+        by_id = {item["id"]: item for item in index}
+        return [by_id[doc_id] for doc_id, _ in self.search(query, limit) if doc_id in by_id]
+
+# Singleton instance, kept current by FirebaseClient writes and listener updates
+kb_search_index = KBSearchIndex()
+firebase_client.subscribe(kb_search_index.on_kb_change)
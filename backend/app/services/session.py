@@ -1,27 +1,130 @@
+import heapq
+import threading
 import time
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import get_settings
+
+def approx_state_bytes(values: Dict[str, Any]) -> int:
+    """Rough size of a conversation state: message text plus retrieved documents."""
+    size = 0
+    for msg in values.get("messages", []):
+        content = getattr(msg, "content", "")
+        size += len(content) if isinstance(content, str) else len(str(content))
+    for doc in values.get("context_docs") or []:
+        size += len(doc.get("content") or "")
+    for key in ("answer", "previous_query", "previous_answer", "summary"):
+        size += len(values.get(key) or "")
+    return size
 
 class SessionManager:
-    def __init__(self):
+    """Tracks session activity with heap-ordered expiry and capped, LRU-evicted capacity.
+
+    The heap holds (last_active, session_id) entries; stale entries left behind
+    by newer activity are skipped when popped, so touches and expiry are
+    O(log n). The oldest live entry is both the next to expire and the least
+    recently used session, which is what gets evicted when a cap is exceeded.
+    """
+
+    def __init__(self, max_sessions: int = 0, max_state_bytes: int = 0):
+        self.max_sessions = max_sessions  # 0 = unlimited
+        self.max_state_bytes = max_state_bytes  # 0 = unlimited
+        self._lock = threading.Lock()
         self._last_active: Dict[str, float] = {}
+        self._state_bytes: Dict[str, int] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self.total_state_bytes = 0
+        self.expired_count = 0
+        self.evicted_count = 0
 
-    def update_activity(self, session_id: str):
-        """Update the last active timestamp for a session."""
-        self._last_active[session_id] = time.time()
+    def update_activity(self, session_id: str, state_bytes: Optional[int] = None) -> List[str]:
+        """Mark a session active (optionally recording its approximate state size).
+
+        Returns the sessions evicted to stay within the caps; the caller owns
+        deleting their checkpoints.
+        """
+        with self._lock:
+            now = time.time()
+            self._last_active[session_id] = now
+            heapq.heappush(self._heap, (now, session_id))
+            if state_bytes is not None:
+                self.total_state_bytes += state_bytes - self._state_bytes.get(session_id, 0)
+                self._state_bytes[session_id] = state_bytes
+            evicted = self._evict_over_cap(keep=session_id)
+            self._compact_heap()
+            return evicted
 
     def get_expired_sessions(self, timeout_seconds: int = 300) -> List[str]:
-        """Return list of session_ids that have been inactive for > timeout."""
-        now = time.time()
+        """Remove and return sessions inactive for longer than timeout_seconds."""
+        cutoff = time.time() - timeout_seconds
         expired = []
-        for session_id, last_time in self._last_active.items():
-            if now - last_time > timeout_seconds:
-                expired.append(session_id)
+        with self._lock:
+            while True:
+                entry = self._peek()
+                if entry is None or entry[0] >= cutoff:
+                    break
+                self._remove(entry[1])
+                expired.append(entry[1])
+            self.expired_count += len(expired)
         return expired
 
     def remove_session(self, session_id: str):
         """Remove a session from tracking."""
-        if session_id in self._last_active:
-            del self._last_active[session_id]
+        with self._lock:
+            self._remove(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "live_sessions": len(self._last_active),
+            "state_bytes": self.total_state_bytes,
+            "expired": self.expired_count,
+            "evicted": self.evicted_count,
+        }
+
+    def _peek(self) -> Optional[Tuple[float, str]]:
+        """Oldest live heap entry, discarding stale ones."""
+        while self._heap:
+            last_active, session_id = self._heap[0]
+            if self._last_active.get(session_id) == last_active:
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def _remove(self, session_id: str):
+        # Heap entry goes stale and is dropped lazily
+        if self._last_active.pop(session_id, None) is not None:
+            self.total_state_bytes -= self._state_bytes.pop(session_id, 0)
+
+    def _over_cap(self) -> bool:
+        return ((self.max_sessions and len(self._last_active) > self.max_sessions) or
+                (self.max_state_bytes and self.total_state_bytes > self.max_state_bytes))
+
+    def _evict_over_cap(self, keep: str) -> List[str]:
+        evicted, skipped = [], None
+        while self._over_cap():
+            entry = self._peek()
+            if entry is None:
+                break
+            if entry[1] == keep:
+                # Never evict the session being served; set it aside
+                skipped = heapq.heappop(self._heap)
+                continue
+            heapq.heappop(self._heap)
+            self._remove(entry[1])
+            evicted.append(entry[1])
+        if skipped is not None:
+            heapq.heappush(self._heap, skipped)
+        self.evicted_count += len(evicted)
+        return evicted
+
+    def _compact_heap(self):
+        # Rebuild when stale entries dominate, keeping memory proportional to live sessions
+        if len(self._heap) > 2 * len(self._last_active) + 64:
+            self._heap = [(t, s) for s, t in self._last_active.items()]
+            heapq.heapify(self._heap)
+
+def _build_manager() -> SessionManager:
+    settings = get_settings()
+    return SessionManager(max_sessions=settings.SESSION_MAX_LIVE, max_state_bytes=settings.SESSION_MAX_STATE_BYTES)
 
 # Singleton instance
-session_manager = SessionManager()
+session_manager = _build_manager()
@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from itertools import islice
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.core.firebase import firebase_client
+from app.services.search import tokenize
+
+# Characters of content embedded with the title/tags/summary of each document
+EMBED_CONTENT_CHARS = 2000
+
+def embedding_text(data: Dict[str, Any]) -> str:
+    """Text that represents a KB document in the vector index."""
+    tags = ", ".join(data.get("tags") or [])
+    content = (data.get("content") or "")[:EMBED_CONTENT_CHARS]
+    return f"{data.get('title', '')}\n{tags}\n{data.get('summary', '')}\n{content}".strip()
+
+class HashingEmbedder:
+    """Deterministic local embedder (signed feature hashing over Hybris-aware tokens).
+
+    Needs no network access, so it stands in for Gemini in tests and benchmarks.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+def make_embedder(backend: str):
+    """Build an embedder by name. Any LangChain Embeddings object also works."""
+    if backend == "hashing":
+        return HashingEmbedder()
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    settings = get_settings()
+    return GoogleGenerativeAIEmbeddings(
+        model=settings.EMBEDDING_MODEL,
+        google_api_key=settings.GEMINI_API_KEY
+    )
+
+class VectorIndex:
+    """Document embeddings in a NumPy matrix with vectorized cosine top-k.
+
+    Rows are L2-normalized, so a single matrix-vector product gives cosine
+    similarity for every document. With a `path`, the matrix is saved as .npy
+    and memory-mapped on load; it is copied into memory on the first write.
+    """
+
+    def __init__(self, embedder=None, path: Optional[str] = None):
+        self.embedder = embedder
+        self.path = path
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._hashes: Dict[str, str] = {}
+        self._texts: Dict[str, Dict[str, Any]] = {}
+        self._pending_sweep: Optional[set] = None
+        # doc_id -> (text, hash) waiting for the background embedder, oldest first
+        self._queued: Dict[str, Tuple[str, str]] = {}
+        self._queue_ready = threading.Condition(self._lock)
+        self._embed_worker: Optional[threading.Thread] = None
+        self._dirty = False
+        self._last_save = 0.0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def set_embedder(self, embedder):
+        """Swap the embedding function. Existing vectors are dropped."""
+        with self._lock:
+            self.embedder = embedder
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._texts = {}
+            self._queued = {}
+            self._clear_vectors()
+
+    def _clear_vectors(self):
+        self._matrix = None
+        self._ids = []
+        self._rows = {}
+        self._hashes = {}
+        self._dirty = True
+
+    def on_kb_change(self, event: str, doc_id: Optional[str], data: Optional[Dict[str, Any]]):
+        """FirebaseClient listener hook. Unchanged documents are not re-embedded after a reload.
+
+        Changed documents are embedded in batches on a background thread, so
+        loading the KB index never waits for embedding round trips.
+        """
+        if event == "reset":
+            with self._lock:
+                self._pending_sweep = set(self._ids)
+        elif event == "synced":
+            with self._lock:
+                for stale_id in self._pending_sweep or ():
+                    self.remove(stale_id)
+                self._pending_sweep = None
+            self.save()
+        elif event == "delete":
+            self.remove(doc_id)
+            self.save(debounce=True)
+        elif event in ("upsert", "update"):
+            staged = self._stage(doc_id, data, partial=event == "update")
+            if staged:
+                self._enqueue(doc_id, *staged)
+
+    def upsert(self, doc_id: str, data: Dict[str, Any], partial: bool = False):
+        """Embed and store one document now (change events go through the batching queue instead)."""
+        staged = self._stage(doc_id, data, partial)
+        if staged:
+            text, text_hash = staged
+            self._store(doc_id, self.embedder.embed_documents([text])[0], text_hash)
+
+    def upsert_many(self, docs: List[Tuple[str, Dict[str, Any]]]):
+        """Embed and store several documents now, EMBED_BATCH_SIZE per embedding call."""
+        staged = []
+        for doc_id, data in docs:
+            item = self._stage(doc_id, data, False)
+            if item:
+                staged.append((doc_id, *item))
+        batch_size = max(1, get_settings().EMBED_BATCH_SIZE)
+        for start in range(0, len(staged), batch_size):
+            batch = staged[start:start + batch_size]
+            vectors = self.embedder.embed_documents([text for _, text, _ in batch])
+            for (doc_id, _, text_hash), vector in zip(batch, vectors):
+                self._store(doc_id, vector, text_hash)
+
+    def _stage(self, doc_id: str, data: Dict[str, Any], partial: bool) -> Optional[Tuple[str, str]]:
+        """Record the document's fields; returns (text, hash) if it needs a new embedding."""
+        with self._lock:
+            if self._pending_sweep is not None:
+                self._pending_sweep.discard(doc_id)
+            fields = {k: data[k] for k in ("title", "tags", "summary", "content") if k in data}
+            if partial:
+                if doc_id not in self._texts:
+                    return None
+                fields = {**self._texts[doc_id], **fields}
+            if "content" in fields:
+                fields["content"] = (fields["content"] or "")[:EMBED_CONTENT_CHARS]
+            text = embedding_text(fields)
+            text_hash = hashlib.sha1(text.encode()).hexdigest()
+            self._texts[doc_id] = fields
+            if self._hashes.get(doc_id) == text_hash:
+                self._queued.pop(doc_id, None)
+                return None
+            return text, text_hash
+
+    def _store(self, doc_id: str, vector, text_hash: str):
+        vector = self._normalize(vector)
+        with self._lock:
+            if self._matrix is not None and self._matrix.shape[1] != len(vector):
+                # Saved with a different embedder; start over
+                self._clear_vectors()
+            self._ensure_writable(len(vector))
+            row = self._rows.get(doc_id)
+            if row is None:
+                row = len(self._ids)
+                self._grow(row + 1)
+                self._ids.append(doc_id)
+                self._rows[doc_id] = row
+            self._matrix[row] = vector
+            self._hashes[doc_id] = text_hash
+            self._dirty = True
+
+    # --- Background embedding ---
+
+    def _enqueue(self, doc_id: str, text: str, text_hash: str):
+        with self._lock:
+            # A newer version of a queued document replaces the older one
+            self._queued.pop(doc_id, None)
+            self._queued[doc_id] = (text, text_hash)
+            if self._embed_worker is None:
+                self._embed_worker = threading.Thread(target=self._embed_loop, name="kb-vector-embedder", daemon=True)
+                self._embed_worker.start()
+            self._queue_ready.notify()
+
+    def _embed_loop(self):
+        batch_size = max(1, get_settings().EMBED_BATCH_SIZE)
+        while True:
+            with self._lock:
+                while not self._queued:
+                    self._queue_ready.wait()
+                batch = list(islice(self._queued.items(), batch_size))
+            try:
+                vectors = self.embedder.embed_documents([text for _, (text, _) in batch])
+            except Exception as e:
+                print(f"Embedding {len(batch)} KB documents failed: {e}")
+                vectors = None
+            with self._lock:
+                for i, (doc_id, (_, text_hash)) in enumerate(batch):
+                    # Skip documents removed or changed again while the batch was embedding
+                    if self._queued.get(doc_id, (None, None))[1] != text_hash:
+                        continue
+                    del self._queued[doc_id]
+                    if vectors is not None:
+                        self._store(doc_id, vectors[i], text_hash)
+                idle = not self._queued
+            self.save(debounce=not idle)
+
+    def pending(self) -> int:
+        """Documents waiting to be embedded."""
+        return len(self._queued)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            row = self._rows.pop(doc_id, None)
+            self._hashes.pop(doc_id, None)
+            self._queued.pop(doc_id, None)
+            self._texts.pop(doc_id, None)
+            if row is None:
+                return
+            self._ensure_writable(self._matrix.shape[1])
+            # Move the last row into the freed slot
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids.pop()
+            self._dirty = True
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, cosine similarity) pairs, best first."""
+        if not self._ids or self.embedder is None:
+            return []
+        return self.search_vector(self.embedder.embed_query(query), k)
+
+    async def asearch(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Like search(), but awaits the embedder when it supports async (e.g. Gemini)."""
+        if not self._ids or self.embedder is None:
+            return []
+        if hasattr(self.embedder, "aembed_query"):
+            return self.search_vector(await self.embedder.aembed_query(query), k)
+        return self.search(query, k)
+
+    def search_vector(self, query_vec, k: int = 5) -> List[Tuple[str, float]]:
+        query_vec = self._normalize(query_vec)
+        with self._lock:
+            count = len(self._ids)
+            if not count or self._matrix.shape[1] != len(query_vec):
+                return []
+            scores = self._matrix[:count] @ query_vec
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[i], float(scores[i])) for i in top]
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _ensure_writable(self, dim: int):
+        if self._matrix is None:
+            self._matrix = np.zeros((16, dim), dtype=np.float32)
+        elif isinstance(self._matrix, np.memmap) or not self._matrix.flags.writeable:
+            self._matrix = np.array(self._matrix)
+
+    def _grow(self, rows: int):
+        capacity = self._matrix.shape[0]
+        if rows > capacity:
+            grown = np.zeros((max(rows, capacity * 2), self._matrix.shape[1]), dtype=np.float32)
+            grown[:capacity] = self._matrix
+            self._matrix = grown
+
+    # --- Persistence ---
+
+    def save(self, debounce: bool = False):
+        """Write the matrix (.npy) and ID/hash sidecar (.json). Debounced saves run at most every VECTOR_INDEX_SAVE_SECONDS."""
+        if not self.path or not self._dirty:
+            return
+        if debounce and time.time() - self._last_save < get_settings().VECTOR_INDEX_SAVE_SECONDS:
+            return
+        with self._lock:
+            count = len(self._ids)
+            matrix = self._matrix[:count] if self._matrix is not None else np.zeros((0, 0), dtype=np.float32)
+            meta = {"ids": list(self._ids), "hashes": [self._hashes[i] for i in self._ids],
+                    "texts": [self._texts[i] for i in self._ids]}
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + ".npy.tmp", "wb") as f:
+                np.save(f, matrix, allow_pickle=False)
+            os.replace(self.path + ".npy.tmp", self.path + ".npy")
+            with open(self.path + ".json.tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(self.path + ".json.tmp", self.path + ".json")
+            self._dirty = False
+            self._last_save = time.time()
+
+    def load(self):
+        """Memory-map a previously saved index, if present."""
+        if not (os.path.exists(self.path + ".npy") and os.path.exists(self.path + ".json")):
+            return
+        try:
+            with open(self.path + ".json") as f:
+                meta = json.load(f)
+            matrix = np.load(self.path + ".npy", mmap_mode="r")
+        except Exception as e:
+            print(f"Could not load vector index from {self.path}: {e}")
+            return
+        with self._lock:
+            self._matrix = matrix if len(meta["ids"]) else None
+            self._ids = list(meta["ids"])
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._hashes = dict(zip(self._ids, meta["hashes"]))
+            self._texts = dict(zip(self._ids, meta["texts"]))
+            self._dirty = False
+        print(f"Vector index loaded ({len(self._ids)} docs) from {self.path}")
+
+# Singleton instance. Only kept in sync when vector retrieval is enabled,
+# so the default strategy never pays for embedding calls.
+_settings = get_settings()
+kb_vector_index = VectorIndex(path=_settings.VECTOR_INDEX_PATH or None)
+if _settings.RETRIEVAL_STRATEGY == "vector":
+    kb_vector_index.embedder = make_embedder(_settings.EMBEDDING_BACKEND)
+    firebase_client.subscribe(kb_vector_index.on_kb_change)
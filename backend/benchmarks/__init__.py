@@ -0,0 +1 @@
+"""Offline benchmarks: fake Gemini/Firestore, load test and retrieval quality (see each module)."""
@@ -0,0 +1,320 @@
+"""Offline stand-ins for Gemini and Firestore.
+
+FakeChatModel answers every prompt the app sends (classification, retrieval,
+generation, extraction, cleaning) deterministically, with configurable
+latency and token streaming. FakeFirestore implements the subset of the
+google-cloud-firestore client that FirebaseClient uses, in memory.
+install() plugs both into the app's singletons.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from google.api_core.exceptions import NotFound
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+GREETINGS = ("hi", "hello", "hey", "thanks", "thank you", "good morning")
+CONFIRMATIONS = ("yes", "correct", "worked", "it worked", "that's right", "perfect", "save it")
+
+_QUERY_RE = re.compile(r'(?:User Message|User Query): "(.*?)"', re.DOTALL)
+_CANDIDATE_RE = re.compile(r"^ID: (\S+)", re.MULTILINE)
+_INPUT_RE = re.compile(r"Input Text:\s*(.*?)\s*(?:Output|Instructions)", re.DOTALL)
+
+def prompt_text(messages) -> str:
+    content = messages[-1].content if messages else ""
+    return content if isinstance(content, str) else str(content)
+
+def _quoted_query(prompt: str) -> str:
+    match = _QUERY_RE.search(prompt)
+    return match.group(1).strip() if match else ""
+
+def fake_reply(prompt: str, answer_words: int = 60) -> str:
+    """The fake model's answer to one of the app's prompts."""
+    if "is_confirmation -" in prompt:
+        query = _quoted_query(prompt).lower().rstrip("!.")
+        intent = "greeting" if query.startswith(GREETINGS) else "technical"
+        confirming = "Confirmations:" in prompt and query in CONFIRMATIONS
+        return json.dumps({"intent": intent, "is_correction": False, "is_confirmation": confirming})
+    if "semantic search expert" in prompt:
+        # Keeps the BM25 shortlist order: measures the shortlist, not a model's judgement
+        return json.dumps(_CANDIDATE_RE.findall(prompt)[:5])
+    if "Knowledge Base Cleaner" in prompt:
+        match = _INPUT_RE.search(prompt)
+        return match.group(1) if match else ""
+    if "Output JSON format" in prompt:
+        match = _INPUT_RE.search(prompt)
+        words = re.findall(r"[A-Za-z]+", match.group(1) if match else "")
+        return json.dumps({
+            "title": " ".join(words[:6]) or "Untitled",
+            "tags": sorted({w.lower() for w in words if len(w) > 3})[:8],
+            "summary": " ".join(words[:20]),
+        })
+    query = _quoted_query(prompt) or "your question"
+    body = f"Here is how to handle {query}: SELECT {{pk}} FROM {{Product}} WHERE {{code}} = ?code"
+    filler = " ".join(f"step{i}" for i in range(max(answer_words - len(body.split()), 0)))
+    return f"{body} {filler}".strip()
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model with simulated latency.
+
+    `latency` is the time to the first token; generation then takes
+    `token_delay` per word, streamed word by word from astream. A prompt's
+    hash adds up to `jitter` (as a fraction of the latency), so repeated
+    runs see the same timings.
+    """
+
+    latency: float = 0.2
+    token_delay: float = 0.005
+    jitter: float = 0.2
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _first_token_delay(self, prompt: str) -> float:
+        fraction = int(hashlib.md5(prompt.encode()).hexdigest()[:4], 16) / 0xFFFF
+        return self.latency * (1 + self.jitter * fraction)
+
+    def _message(self, prompt: str, text: str) -> AIMessage:
+        usage = {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=text, usage_metadata=usage)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = prompt_text(messages)
+        text = fake_reply(prompt, self.answer_words)
+        time.sleep(self._first_token_delay(prompt) + self.token_delay * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=self._message(prompt, text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = prompt_text(messages)
+        text = fake_reply(prompt, self.answer_words)
+        await asyncio.sleep(self._first_token_delay(prompt) + self.token_delay * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=self._message(prompt, text))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = prompt_text(messages)
+        await asyncio.sleep(self._first_token_delay(prompt))
+        for i, word in enumerate(fake_reply(prompt, self.answer_words).split(" ")):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            text = word if i == 0 else " " + word
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+# --- Firestore ---
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+class FakeDocumentRef:
+    def __init__(self, collection: "FakeCollection", doc_id: str):
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self) -> FakeSnapshot:
+        self.collection.db.rpc()
+        with self.collection.db.lock:
+            return FakeSnapshot(self.id, self.collection.docs.get(self.id))
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self.collection.db.rpc()
+        self.collection._write(self.id, data, merge)
+
+    def update(self, data: Dict[str, Any]):
+        self.collection.db.rpc()
+        with self.collection.db.lock:
+            if self.id not in self.collection.docs:
+                raise NotFound(f"No document to update: {self.id}")
+        self.collection._write(self.id, data, merge=True)
+
+    def delete(self):
+        self.collection.db.rpc()
+        with self.collection.db.lock:
+            self.collection.docs.pop(self.id, None)
+
+_OPS = {
+    "==": lambda x, v: x == v,
+    "!=": lambda x, v: x != v,
+    "<": lambda x, v: x is not None and x < v,
+    "<=": lambda x, v: x is not None and x <= v,
+    ">": lambda x, v: x is not None and x > v,
+    ">=": lambda x, v: x is not None and x >= v,
+    "in": lambda x, v: x in v,
+    "not-in": lambda x, v: x not in v,
+    "array_contains": lambda x, v: isinstance(x, list) and v in x,
+    "array_contains_any": lambda x, v: isinstance(x, list) and any(i in x for i in v),
+}
+
+class FakeQuery:
+    """Filters, projection, ID ordering, cursor and limit; evaluated on stream()."""
+
+    def __init__(self, collection: "FakeCollection", filters=(), fields=None, after=None, count=None):
+        self.collection = collection
+        self._filters: Tuple = tuple(filters)
+        self._fields = fields
+        self._after = after
+        self._count = count
+
+    def _copy(self, **changes) -> "FakeQuery":
+        state = {"filters": self._filters, "fields": self._fields, "after": self._after, "count": self._count}
+        state.update(changes)
+        return FakeQuery(self.collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, _OPS[op_string], value),))
+
+    def select(self, field_paths) -> "FakeQuery":
+        return self._copy(fields=list(field_paths))
+
+    def order_by(self, field_path, direction=None) -> "FakeQuery":
+        return self  # Results are always in document ID order
+
+    def start_after(self, cursor) -> "FakeQuery":
+        value = cursor.get("__name__") if isinstance(cursor, dict) else cursor
+        return self._copy(after=getattr(value, "id", value))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(count=count)
+
+    def stream(self) -> Iterator[FakeSnapshot]:
+        self.collection.db.rpc()
+        with self.collection.db.lock:
+            items = sorted(self.collection.docs.items())
+        returned = 0
+        for doc_id, data in items:
+            if self._after is not None and doc_id <= self._after:
+                continue
+            if not all(test(data.get(field), value) for field, test, value in self._filters):
+                continue
+            if self._count is not None and returned >= self._count:
+                return
+            returned += 1
+            self.collection.db.reads += 1
+            if self._fields is not None:
+                data = {k: v for k, v in data.items() if k in self._fields}
+            yield FakeSnapshot(doc_id, data)
+
+class _Change:
+    class _Type:
+        name = "ADDED"
+
+    type = _Type()
+
+    def __init__(self, document: FakeSnapshot):
+        self.document = document
+
+class _Watch:
+    def unsubscribe(self):
+        pass
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db: "FakeFirestore", name: str):
+        super().__init__(self)
+        self.db = db
+        self.name = name
+        self.docs: Dict[str, Dict[str, Any]] = {}
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentRef:
+        return FakeDocumentRef(self, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: Dict[str, Any], document_id: Optional[str] = None):
+        ref = self.document(document_id)
+        ref.set(data)
+        return time.time(), ref
+
+    def on_snapshot(self, callback):
+        """Delivers the current documents once; later local writes reach the app via write-through."""
+        with self.db.lock:
+            snapshots = [FakeSnapshot(doc_id, data) for doc_id, data in sorted(self.docs.items())]
+        self.db.reads += len(snapshots)
+        callback(snapshots, [_Change(snapshot) for snapshot in snapshots], time.time())
+        return _Watch()
+
+    def _write(self, doc_id: str, data: Dict[str, Any], merge: bool):
+        with self.db.lock:
+            current = self.docs.get(doc_id) if merge else None
+            self.docs[doc_id] = {**(current or {}), **copy.deepcopy(data)}
+            self.db.writes += 1
+
+class FakeBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self.db = db
+        self._ops: List[Tuple[FakeDocumentRef, Dict[str, Any], bool]] = []
+
+    def set(self, ref: FakeDocumentRef, data: Dict[str, Any], merge: bool = False):
+        self._ops.append((ref, data, merge))
+
+    def commit(self):
+        self.db.rpc()
+        for ref, data, merge in self._ops:
+            ref.collection._write(ref.id, data, merge)
+
+class FakeFirestore:
+    """In-memory Firestore client. `rpc_latency` seconds are slept per round trip."""
+
+    def __init__(self, rpc_latency: float = 0.0):
+        self.rpc_latency = rpc_latency
+        self.lock = threading.RLock()
+        self.collections: Dict[str, FakeCollection] = {}
+        self.reads = 0
+        self.writes = 0
+
+    def rpc(self):
+        if self.rpc_latency:
+            time.sleep(self.rpc_latency)
+
+    def collection(self, name: str) -> FakeCollection:
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(self, name)
+            return self.collections[name]
+
+    def get_all(self, refs, field_paths=None) -> Iterator[FakeSnapshot]:
+        self.rpc()
+        for ref in refs:
+            self.reads += 1
+            with self.lock:
+                data = ref.collection.docs.get(ref.id)
+            yield FakeSnapshot(ref.id, copy.deepcopy(data))
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def load(self, collection: str, docs: List[Dict[str, Any]]):
+        """Seed documents (each with an "id") without counting writes."""
+        target = self.collection(collection)
+        with self.lock:
+            for doc in docs:
+                data = dict(doc)
+                target.docs[data.pop("id")] = data
+
+def install(llm: Optional[FakeChatModel] = None, db: Optional[FakeFirestore] = None) -> Tuple[FakeChatModel, FakeFirestore]:
+    """Route the app's LLM registry and FirebaseClient to the fakes. Call before the first request."""
+    from app.core.llm import llm_registry
+    from app.core.firebase import firebase_client
+
+    llm = llm or FakeChatModel()
+    db = db or FakeFirestore()
+    llm_registry.set_backend(lambda profile, config: llm)
+    firebase_client.db = db
+    firebase_client.collection_name = "knowledge_base"
+    return llm, db
@@ -0,0 +1,92 @@
+"""Cold-start budget: how long `import app.main` takes, and that it stays lazy.
+
+Each run imports the app in a fresh interpreter and times it; the fastest of
+--repeat runs is checked against --budget. The import must not connect to
+Firestore, build the LLM-backed extractor or compile the agent graph; that
+work belongs to the warm-up phase (see /ready). Nor may it need credentials:
+the probe runs without a Gemini key. The slowest modules by
+cumulative import time (from `python -X importtime`) are listed to show where
+a regression came from.
+
+    cd backend
+    python -m benchmarks.import_time --budget 1.0
+
+Exits with status 1 when the budget is exceeded or a singleton was built eagerly.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - started
+from app.core.firebase import firebase_client
+from app.services.agent import app as agent_app
+from app.services.extractor import extractor
+print(json.dumps({
+    "seconds": seconds,
+    "eager": {
+        "firestore": firebase_client._connected,
+        "graph": agent_app.initialized,
+        "extractor": extractor.initialized,
+    },
+}))
+"""
+
+def run_probe(importtime: bool = False) -> Tuple[Dict, str]:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+    # Importing must work without credentials, so the probe runs without the Gemini key
+    env = {k: v for k, v in os.environ.items() if k != "GEMINI_API_KEY"}
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing app.main failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+def slowest_modules(importtime_log: str, top: int) -> List[Tuple[str, float]]:
+    """Modules by cumulative import time (their own imports included), from `-X importtime` output."""
+    totals: Dict[str, float] = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():  # Skips the header line
+            totals[name.strip()] = int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--budget", type=float, default=1.0, help="allowed import time (s)")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters to time (best is used)")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    runs = [run_probe()[0] for _ in range(args.repeat)]
+    best = min(run["seconds"] for run in runs)
+    eager = sorted({name for run in runs for name, built in run["eager"].items() if built})
+
+    _, log = run_probe(importtime=True)
+    print("module".ljust(48) + "cumulative_s".rjust(14))
+    for module, seconds in slowest_modules(log, args.top):
+        print(module.ljust(48) + f"{seconds:.3f}".rjust(14))
+
+    print(f"\nimport app.main: {best:.3f}s best of {args.repeat} (budget {args.budget:.3f}s)")
+    failed = False
+    if best > args.budget:
+        print("FAIL: import time is over budget")
+        failed = True
+    if eager:
+        print(f"FAIL: built at import time: {', '.join(eager)}")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Concurrent-session load test for /api/chat, /api/kb and /api/extract.
+
+By default the app runs in-process behind uvicorn with the fake LLM and the
+in-memory Firestore (no Gemini or Firestore costs), seeded with a synthetic
+KB. Each simulated session sends a few chat turns and, interleaved, some KB
+listings and extractions. Reported per endpoint (and for the time to the
+first streamed chat token): requests/s and p50/p95/p99. Per graph node and per
+LLM/Firestore call, timings come from the request traces (/api/admin/traces).
+
+    cd backend
+    python -m benchmarks.load_test --sessions 200 --concurrency 50 --save-baseline local
+    python -m benchmarks.load_test --sessions 200 --concurrency 50 --compare local
+
+--compare exits with status 1 when p95/p99 or req/s regress beyond
+--tolerance. Baselines are machine-specific; compare runs from the same host.
+--url points the driver at an already running server instead (then the fakes
+and seeding are up to that server).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.report import compare, format_table, load_baseline, save_baseline, summarize
+
+GREETING = "Hello there!"
+COLUMNS = ["count", "errors", "req_per_s", "p50_ms", "p95_ms", "p99_ms"]
+SPAN_COLUMNS = ["count", "p50_ms", "p95_ms", "p99_ms", "mean_ms"]
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool = True):
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+def configure_environment(args):
+    """Settings for an isolated in-process run; must happen before the app is imported."""
+    workdir = tempfile.mkdtemp(prefix="hybris-bench-")
+    os.environ.setdefault("CHECKPOINT_BACKEND", "sqlite")
+    os.environ.setdefault("CHECKPOINT_SQLITE_PATH", os.path.join(workdir, "checkpoints.sqlite"))
+    os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+    os.environ.setdefault("VECTOR_INDEX_PATH", "")
+    os.environ.setdefault("SESSION_MAX_LIVE", str(max(1000, args.sessions * 2)))
+    # Every turn is traced so per-node timings cover the whole run
+    os.environ["TRACE_SAMPLE_RATE"] = "1.0"
+    os.environ["TRACE_BUFFER_SIZE"] = str(args.sessions * args.turns + 100)
+
+def start_app(args) -> Tuple[Any, str]:
+    """Install the fakes, seed the KB and serve the app from a background thread."""
+    import uvicorn
+    from benchmarks.fakes import FakeChatModel, FakeFirestore, install
+    from benchmarks.synthetic import synthetic_kb
+
+    llm = FakeChatModel(latency=args.llm_latency, token_delay=args.token_delay, answer_words=args.answer_words)
+    db = FakeFirestore(rpc_latency=args.firestore_latency)
+    db.load("knowledge_base", synthetic_kb(args.kb_size, seed=args.seed))
+    install(llm, db)
+
+    from app.main import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    threading.Thread(target=server.run, name="bench-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+def session_plan(session: int, args, queries: List[str]) -> List[Tuple[str, Any]]:
+    """The requests one session sends, in a deterministic per-session order."""
+    rng = random.Random(args.seed * 100003 + session)
+    chats = [("chat", rng.choice(queries)) for _ in range(args.turns)]
+    if chats and rng.random() < args.greeting_ratio:
+        chats[0] = ("chat", GREETING)
+    others = [("kb", rng.choice([None, "verified", "unverified"])) for _ in range(args.kb_requests)]
+    others += [("extract", rng.choice(queries)) for _ in range(args.extract_requests)]
+    rng.shuffle(others)
+    # Chat turns keep their order; KB and extract calls are spread between them
+    plan = list(chats)
+    for request in others:
+        plan.insert(rng.randint(0, len(plan)), request)
+    return plan
+
+async def send_chat(client, session_id: str, message: str, recorder: Recorder):
+    started = time.perf_counter()
+    first_token = None
+    ok = True
+    try:
+        async with client.stream("POST", "/api/chat", json={"message": message, "session_id": session_id}) as response:
+            ok = response.status_code == 200
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "token" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif event.get("type") == "error":
+                    ok = False
+    except Exception:
+        ok = False
+    recorder.record("POST /api/chat", time.perf_counter() - started, ok)
+    if first_token is not None:
+        recorder.record("chat first token", first_token)
+
+async def send_request(client, endpoint: str, method: str, path: str, recorder: Recorder, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+        ok = response.status_code < 400
+    except Exception:
+        ok = False
+    recorder.record(endpoint, time.perf_counter() - started, ok)
+
+async def run_session(client, session: int, args, queries: List[str], recorder: Recorder, run_id: str) -> str:
+    session_id = f"bench-{run_id}-{session}"
+    for kind, value in session_plan(session, args, queries):
+        if kind == "chat":
+            await send_chat(client, session_id, value, recorder)
+        elif kind == "kb":
+            params = {"limit": 50, **({"status": value} if value else {})}
+            await send_request(client, "GET /api/kb", "GET", "/api/kb", recorder, params=params)
+        else:
+            await send_request(client, "POST /api/extract", "POST", "/api/extract", recorder, json={"text": value})
+    return session_id
+
+async def collect_spans(client, session_ids: List[str]) -> Tuple[Dict[str, List[float]], Dict[str, List[float]]]:
+    """Durations of node spans and of LLM/Firestore/extractor spans, from the recorded traces."""
+    nodes: Dict[str, List[float]] = defaultdict(list)
+    calls: Dict[str, List[float]] = defaultdict(list)
+    for session_id in session_ids:
+        response = await client.get(f"/api/admin/traces/{session_id}")
+        if response.status_code != 200:
+            continue
+        for trace in response.json():
+            stack = list(trace["root"]["children"])
+            while stack:
+                span = stack.pop()
+                (nodes if span["kind"] == "node" else calls)[span["name"]].append(span["duration"] or 0.0)
+                stack.extend(span["children"])
+    return nodes, calls
+
+async def drive(args, base_url: str) -> Dict[str, Any]:
+    import httpx
+    from benchmarks.synthetic import synthetic_kb
+
+    queries = [f"How do I {doc['title'].lower()}?" for doc in synthetic_kb(min(args.kb_size, 500), seed=args.seed)]
+    run_id = f"{int(time.time())}"
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        # Warm-up (index load, first graph run) is not measured
+        await run_session(client, -1, args, queries, Recorder(), run_id)
+
+        recorder = Recorder()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(session: int) -> str:
+            async with semaphore:
+                return await run_session(client, session, args, queries, recorder, run_id)
+
+        started = time.perf_counter()
+        session_ids = await asyncio.gather(*(bounded(i) for i in range(args.sessions)))
+        wall = time.perf_counter() - started
+        nodes, calls = await collect_spans(client, session_ids)
+
+    total = sum(len(v) for k, v in recorder.latencies.items() if k != "chat first token")
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare", "url", "json")},
+        "wall_seconds": round(wall, 3),
+        "req_per_s": round(total / wall, 2),
+        "endpoints": {
+            # Time to first token is a latency of chat requests, not a request stream of its own
+            name: summarize(values, None if name == "chat first token" else wall, recorder.errors[name])
+            for name, values in sorted(recorder.latencies.items())
+        },
+        "nodes": {name: summarize(values) for name, values in sorted(nodes.items())},
+        "calls": {name: summarize(values) for name, values in sorted(calls.items())},
+    }
+
+def print_report(result: Dict[str, Any]):
+    print(f"\n{result['wall_seconds']}s wall, {result['req_per_s']} req/s overall\n")
+    print(format_table("endpoint", result["endpoints"], COLUMNS))
+    if result["nodes"]:
+        print()
+        print(format_table("graph node", result["nodes"], SPAN_COLUMNS))
+    if result["calls"]:
+        print()
+        print(format_table("call", result["calls"], SPAN_COLUMNS))
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sessions", type=int, default=100, help="simulated sessions")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per session")
+    parser.add_argument("--kb-requests", type=int, default=1, help="GET /api/kb calls per session")
+    parser.add_argument("--extract-requests", type=int, default=1, help="POST /api/extract calls per session")
+    parser.add_argument("--concurrency", type=int, default=20, help="sessions running at once")
+    parser.add_argument("--greeting-ratio", type=float, default=0.2, help="sessions opening with a greeting")
+    parser.add_argument("--kb-size", type=int, default=1000, help="synthetic KB documents")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake LLM time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="fake LLM delay per streamed word (s)")
+    parser.add_argument("--answer-words", type=int, default=60, help="words in a generated answer")
+    parser.add_argument("--firestore-latency", type=float, default=0.01, help="fake Firestore round trip (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--save-baseline", metavar="NAME", help="save results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare with a saved baseline (exit 1 on regression)")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression (tail latency varies ~20%% between runs)")
+    parser.add_argument("--json", action="store_true", help="print the raw results as JSON")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        configure_environment(args)
+        server, base_url = start_app(args)
+
+    try:
+        result = asyncio.run(drive(args, base_url))
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    print(json.dumps(result, indent=2) if args.json else "", end="")
+    print_report(result)
+    if args.save_baseline:
+        print(f"\nBaseline saved to {save_baseline(args.save_baseline, result)}")
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        if baseline.get("config") != result["config"]:
+            print("\nWarning: baseline was recorded with a different configuration.")
+        regressions = compare(result["endpoints"], baseline.get("endpoints", {}), args.tolerance, "endpoint")
+        regressions += compare(result["nodes"], baseline.get("nodes", {}), args.tolerance, "node")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.compare} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Latency summaries, result tables and baseline files shared by the benchmarks."""
+import json
+import math
+import os
+import platform
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies: List[float], wall_seconds: Optional[float] = None, errors: int = 0) -> Dict[str, float]:
+    """count, errors, p50/p95/p99/mean in milliseconds, and req/s over `wall_seconds`."""
+    values = sorted(latencies)
+    summary = {
+        "count": len(values),
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+    }
+    if wall_seconds:
+        summary["req_per_s"] = round(len(values) / wall_seconds, 2)
+    return summary
+
+def format_table(title: str, rows: Dict[str, Dict[str, Any]], columns: List[str]) -> str:
+    width = max([len(title)] + [len(name) for name in rows]) + 2
+    lines = [title.ljust(width) + "".join(c.rjust(12) for c in columns)]
+    for name, row in rows.items():
+        lines.append(name.ljust(width) + "".join(str(row.get(c, "")).rjust(12) for c in columns))
+    return "\n".join(lines)
+
+def baseline_path(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+def save_baseline(name: str, result: Dict[str, Any]) -> str:
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = {"saved_at": time.time(), "machine": platform.node(), "python": platform.python_version(), **result}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    return path
+
+def load_baseline(name: str) -> Dict[str, Any]:
+    with open(baseline_path(name), encoding="utf-8") as f:
+        return json.load(f)
+
+def compare(current: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float,
+            section: str, min_delta_ms: float = 1.0) -> List[str]:
+    """Regressions of `current` against `baseline` rows: slower p95/p99 or lower req/s beyond `tolerance`.
+
+    Latency changes under `min_delta_ms` are ignored (sub-millisecond spans are mostly noise).
+    """
+    regressions = []
+    for name, row in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            value = row.get(metric, 0)
+            if base.get(metric) and value > base[metric] * (1 + tolerance) and value - base[metric] >= min_delta_ms:
+                regressions.append(f"{section} {name}: {metric} {base[metric]} -> {row[metric]}")
+        if base.get("req_per_s") and row.get("req_per_s") is not None and row["req_per_s"] < base["req_per_s"] * (1 - tolerance):
+            regressions.append(f"{section} {name}: req_per_s {base['req_per_s']} -> {row['req_per_s']}")
+    return regressions
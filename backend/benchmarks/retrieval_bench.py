@@ -0,0 +1,205 @@
+"""Retrieval quality and latency of each retriever strategy as the KB grows.
+
+Runs the retriever's own selection functions over a labelled query set,
+against synthetic Hybris KBs of several sizes (or an exported KB):
+
+    llm     select_by_llm: BM25 shortlist rendered into RETRIEVAL_PROMPT, then the model picks
+    vector  select_by_vector: embedding top-k above VECTOR_MIN_SCORE
+    bm25    the shortlist ranking alone (no LLM), for reference
+
+Fully offline: the LLM is a stub and embeddings use the HashingEmbedder. The
+stub returns the shortlist's first five IDs, so the llm row measures the
+shortlist and the prompt cost, not Gemini's judgement; `cand_recall` is the
+best recall@5 any model could reach from the candidates in the prompt.
+Vector numbers likewise reflect the HashingEmbedder, not Gemini embeddings.
+`full_index_tokens` is what a prompt listing the whole index would cost.
+
+    cd backend
+    python -m benchmarks.retrieval_bench --sizes 100,1000,10000,50000
+    python -m benchmarks.retrieval_bench --kb kb_export.ndjson --dataset labelled.jsonl
+
+A custom dataset has one JSON object per line: {"query": ..., "relevant_ids": [...]}.
+The bundled one (data/retrieval_queries.jsonl) labels synthetic entries by
+item type, snippet kind and attribute instead, so it applies at every size.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from benchmarks.report import format_table, percentile, save_baseline
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "data", "retrieval_queries.jsonl")
+STRATEGIES = ("llm", "vector", "bm25")
+K = 5
+COLUMNS = ["queries", "recall@5", "mrr", "cand_recall", "prompt_tok", "p50_ms", "p95_ms"]
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def relevant_ids(item: Dict[str, Any], docs: List[Dict[str, Any]]) -> Set[str]:
+    if "relevant_ids" in item:
+        return set(item["relevant_ids"])
+    from benchmarks.synthetic import matches
+    return {doc["id"] for doc in docs if matches(doc, **item["relevant"])}
+
+def recall_at_k(ranked: List[str], relevant: Set[str], k: int = K) -> float:
+    """Share of the achievable hits (at most k) found in the top k."""
+    return len(set(ranked[:k]) & relevant) / min(len(relevant), k)
+
+def reciprocal_rank(ranked: List[str], relevant: Set[str]) -> float:
+    for rank, doc_id in enumerate(ranked, start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+def build_indexes(docs: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Load the KB into the BM25 and vector singletons the retriever uses; returns build seconds."""
+    from app.services.search import kb_search_index
+    from app.services.vector_store import HashingEmbedder, kb_vector_index
+
+    started = time.perf_counter()
+    kb_search_index.clear()
+    for doc in docs:
+        kb_search_index.upsert(doc["id"], doc)
+    bm25_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    kb_vector_index.set_embedder(HashingEmbedder())
+    kb_vector_index.upsert_many([(doc["id"], doc) for doc in docs])
+    return {"bm25_build_s": round(bm25_seconds, 2), "vector_build_s": round(time.perf_counter() - started, 2)}
+
+def index_entries(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The cached KB index as FirebaseClient.fetch_index() returns it."""
+    from app.core.firebase import INDEX_FIELDS
+    return [{"id": doc["id"], **{field: doc.get(field, default) for field, default in INDEX_FIELDS.items()}}
+            for doc in docs]
+
+def full_index_tokens(index: List[Dict[str, Any]]) -> int:
+    from app.core.chunking import estimate_tokens
+    from app.services.agent.prompts import RETRIEVAL_PROMPT
+    index_str = "\n".join(
+        f"ID: {item['id']}\nTitle: {item['title']}\nTags: {', '.join(item['tags']) if item['tags'] else 'none'}\nSummary: {item.get('summary', 'N/A')}\n"
+        for item in index
+    )
+    return estimate_tokens(RETRIEVAL_PROMPT.format(query="", index_str=index_str))
+
+async def run_strategy(strategy: str, queries: List[Dict[str, Any]], index: List[Dict[str, Any]], model) -> Dict[str, Any]:
+    from app.core.config import get_settings
+    from app.services.agent.nodes.retriever import select_by_llm, select_by_vector
+    from app.services.search import kb_search_index
+
+    candidate_limit = get_settings().RETRIEVAL_CANDIDATE_LIMIT
+    recalls, ranks, candidate_recalls, prompt_tokens, timings = [], [], [], [], []
+    for item in queries:
+        query, relevant = item["query"], item["relevant_ids"]
+        model.prompt_tokens = 0
+        started = time.perf_counter()
+        if strategy == "llm":
+            ranked = await select_by_llm(query, index)
+        elif strategy == "vector":
+            ranked = await select_by_vector(query)
+        else:
+            ranked = [doc_id for doc_id, _ in kb_search_index.search(query, K)]
+        timings.append(time.perf_counter() - started)
+
+        recalls.append(recall_at_k(ranked, relevant))
+        ranks.append(reciprocal_rank(ranked, relevant))
+        prompt_tokens.append(model.prompt_tokens)
+        if strategy == "llm":
+            shortlist = [item["id"] for item in kb_search_index.shortlist(query, index, candidate_limit)]
+            # Best recall@5 any model could reach from these candidates
+            candidate_recalls.append(min(len(set(shortlist) & relevant), K) / min(len(relevant), K))
+
+    timings.sort()
+    count = len(queries)
+    return {
+        "queries": count,
+        "recall@5": round(sum(recalls) / count, 3),
+        "mrr": round(sum(ranks) / count, 3),
+        "cand_recall": round(sum(candidate_recalls) / count, 3) if candidate_recalls else "",
+        "prompt_tok": round(sum(prompt_tokens) / count),
+        "p50_ms": round(percentile(timings, 50) * 1000, 2),
+        "p95_ms": round(percentile(timings, 95) * 1000, 2),
+    }
+
+async def bench_kb(name: str, docs: List[Dict[str, Any]], dataset: List[Dict[str, Any]], strategies: List[str], model) -> Dict[str, Any]:
+    queries = []
+    for item in dataset:
+        relevant = relevant_ids(item, docs)
+        if relevant:  # Queries with nothing relevant in this KB cannot be scored
+            queries.append({"query": item["query"], "relevant_ids": relevant})
+    index = index_entries(docs)
+    result = {"documents": len(docs), "full_index_tokens": full_index_tokens(index), **build_indexes(docs), "strategies": {}}
+    print(f"\n{name}: {len(docs)} documents, {len(queries)}/{len(dataset)} scorable queries, "
+          f"index built in {result['bm25_build_s']}s (BM25) / {result['vector_build_s']}s (vectors), "
+          f"full-index prompt ~{result['full_index_tokens']} tokens")
+    for strategy in strategies:
+        result["strategies"][strategy] = await run_strategy(strategy, queries, index, model)
+    print(format_table("strategy", result["strategies"], COLUMNS))
+    return result
+
+def make_model():
+    """Stub LLM that records the prompt size of its last call."""
+    from app.core.chunking import estimate_tokens
+    from benchmarks.fakes import FakeChatModel, prompt_text
+
+    class PromptSizeRecorder(FakeChatModel):
+        prompt_tokens: int = 0
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            self.prompt_tokens = estimate_tokens(prompt_text(messages))
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+    return PromptSizeRecorder(latency=0.0, token_delay=0.0, jitter=0.0)
+
+async def run(args) -> Dict[str, Any]:
+    from app.core.llm import llm_registry
+    from benchmarks.synthetic import synthetic_kb
+
+    model = make_model()
+    llm_registry.set_backend(lambda profile, config: model)
+    dataset = read_jsonl(args.dataset)
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    results = {}
+    if args.kb:
+        results["kb"] = await bench_kb(args.kb, read_jsonl(args.kb), dataset, strategies, model)
+    else:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            results[str(size)] = await bench_kb(f"synthetic-{size}", synthetic_kb(size, seed=args.seed), dataset, strategies, model)
+    return results
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default="100,1000,10000,50000", help="synthetic KB sizes")
+    parser.add_argument("--kb", help="benchmark an exported KB (NDJSON from /api/kb/export) instead")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="labelled queries (JSONL)")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--candidate-limit", type=int, help="override RETRIEVAL_CANDIDATE_LIMIT")
+    parser.add_argument("--vector-min-score", type=float, help="override VECTOR_MIN_SCORE")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="NAME", help="save results as benchmarks/baselines/NAME.json")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Settings are read once, so overrides go in before the app is imported
+    os.environ["EMBEDDING_BACKEND"] = "hashing"
+    os.environ["VECTOR_INDEX_PATH"] = ""
+    if args.candidate_limit is not None:
+        os.environ["RETRIEVAL_CANDIDATE_LIMIT"] = str(args.candidate_limit)
+    if args.vector_min_score is not None:
+        os.environ["VECTOR_MIN_SCORE"] = str(args.vector_min_score)
+
+    results = asyncio.run(run(args))
+    if args.save_baseline:
+        path = save_baseline(args.save_baseline, {"config": vars(args), "results": results})
+        print(f"\nResults saved to {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Deterministic Hybris-style KB entries for benchmarks."""
+import random
+from typing import Any, Dict, List, Optional
+
+ITEM_TYPES = {
+    "Product": ["code", "name", "approvalStatus", "catalogVersion", "unit", "ean"],
+    "Order": ["code", "status", "user", "date", "totalPrice", "store"],
+    "Customer": ["uid", "name", "customerID", "defaultPaymentAddress", "sessionLanguage"],
+    "Cart": ["code", "user", "site", "totalPrice", "modifiedtime"],
+    "CartEntry": ["order", "product", "quantity", "entryNumber", "basePrice"],
+    "StockLevel": ["productCode", "warehouse", "available", "reserved", "inStockStatus"],
+    "PriceRow": ["product", "price", "currency", "unit", "ug"],
+    "Category": ["code", "name", "supercategories", "catalogVersion"],
+    "Media": ["code", "mime", "realFileName", "folder", "catalogVersion"],
+    "CronJob": ["code", "job", "status", "result", "startTime"],
+    "Address": ["owner", "streetname", "town", "postalcode", "country"],
+    "Warehouse": ["code", "name", "vendor", "default"],
+    "PromotionSourceRule": ["code", "status", "priority", "website"],
+    "Voucher": ["code", "value", "currency", "redemptionQuantityLimit"],
+    "Consignment": ["code", "status", "order", "warehouse", "shippingDate"],
+    "BaseSite": ["uid", "channel", "stores", "defaultLanguage"],
+    "UserGroup": ["uid", "locName", "members", "groups"],
+    "Employee": ["uid", "name", "groups", "loginDisabled"],
+    "CatalogVersion": ["catalog", "version", "active", "languages"],
+    "ProductReference": ["source", "target", "referenceType", "active"],
+}
+
+TASKS = {
+    "flexsearch": [
+        ("find {type} by {attr}", "Finds {type} items filtered on {attr}."),
+        ("count {type} grouped by {attr}", "Counts {type} items per {attr} value."),
+        ("list {type} modified today", "Lists {type} items changed since midnight."),
+        ("join {type} with {other}", "Joins {type} and {other} on their reference."),
+    ],
+    "impex": [
+        ("insert_update {type} with {attr}", "Impex header creating or updating {type} keyed by {attr}."),
+        ("remove {type} by {attr}", "Impex removing {type} items matching {attr}."),
+        ("import {type} for {other}", "Impex importing {type} linked to {other}."),
+    ],
+    "groovy": [
+        ("update {type} {attr} in bulk", "Groovy script updating {attr} on many {type} items via modelService."),
+        ("export {type} to csv", "Groovy script writing {type} items and their {attr} to CSV."),
+        ("fix {type} with missing {attr}", "Groovy script repairing {type} items whose {attr} is empty."),
+    ],
+}
+
+def _content(kind: str, item_type: str, attr: str, other: str) -> str:
+    if kind == "flexsearch":
+        return (
+            f"SELECT {{t.pk}}, {{t.{attr}}} FROM {{{item_type} AS t}}\n"
+            f"LEFT JOIN {{{other} AS o}} ON {{o.pk}} = {{t.pk}}\n"
+            f"WHERE {{t.{attr}}} IS NOT NULL\n"
+            f"ORDER BY {{t.{attr}}}"
+        )
+    if kind == "impex":
+        return (
+            f"INSERT_UPDATE {item_type};{attr}[unique=true];{other.lower()}(code)\n"
+            f";value-1;{other.lower()}-1\n"
+            f";value-2;{other.lower()}-2"
+        )
+    return (
+        f"def query = \"SELECT {{pk}} FROM {{{item_type}}} WHERE {{{attr}}} IS NULL\"\n"
+        f"def items = flexibleSearchService.search(query).result\n"
+        f"items.each {{ item ->\n"
+        f"    item.{attr} = item.{attr} ?: 'default'\n"
+        f"    modelService.save(item)\n"
+        f"}}"
+    )
+
+def synthetic_kb(size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`size` KB documents ("id" included) mixing FlexSearch, Impex and Groovy snippets."""
+    rng = random.Random(seed)
+    types = list(ITEM_TYPES)
+    kinds = list(TASKS)
+    docs = []
+    for i in range(size):
+        item_type = types[i % len(types)]
+        kind = kinds[(i // len(types)) % len(kinds)]
+        attr = rng.choice(ITEM_TYPES[item_type])
+        other = rng.choice([t for t in types if t != item_type])
+        title_template, summary_template = rng.choice(TASKS[kind])
+        fields = {"type": item_type, "attr": attr, "other": other}
+        title = title_template.format(**fields)
+        docs.append({
+            "id": f"kb-{i:06d}",
+            "title": title[0].upper() + title[1:],
+            "content": _content(kind, item_type, attr, other),
+            "tags": [item_type, attr, kind, other],
+            "summary": summary_template.format(**fields),
+            "type": "code",
+            "status": "verified" if rng.random() < 0.8 else "unverified",
+            "ai_created": rng.random() < 0.3,
+        })
+    return docs
+
+def matches(doc: Dict[str, Any], type: str, kind: str, attr: Optional[str] = None) -> bool:
+    """Whether a synthetic entry is about `type` (its primary item type), as a `kind` snippet, on `attr`."""
+    tags = doc.get("tags") or []
+    if len(tags) < 3:
+        return False
+    return tags[0] == type and tags[2] == kind and (attr is None or tags[1] == attr)
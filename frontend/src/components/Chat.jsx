@@ -86,13 +86,18 @@ export default function Chat() {
             const reader = response.body.getReader();
             const decoder = new TextDecoder();
             let thinkingSteps = [];
+            let streamed = '';
+            let buffer = '';
 
             while (true) {
                 const { value, done } = await reader.read();
                 if (done) break;
 
-                const chunk = decoder.decode(value);
-                for (const line of chunk.split('\n')) {
+                // Keep any partial line until the rest of it arrives
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                for (const line of lines) {
                     if (!line.trim()) continue;
                     try {
                         const data = JSON.parse(line);
@@ -100,10 +105,18 @@ export default function Chat() {
                             thinkingSteps.push(data.content);
                             setMessages(prev => {
                                 const newMsgs = [...prev];
-                                newMsgs[newMsgs.length - 1] = { role: 'model', content: '', isThinking: true, thinkingSteps: [...thinkingSteps] };
+                                newMsgs[newMsgs.length - 1] = { role: 'model', content: streamed, isThinking: !streamed, thinkingSteps: [...thinkingSteps] };
+                                return newMsgs;
+                            });
+                        } else if (data.type === 'token') {
+                            streamed += data.content;
+                            setMessages(prev => {
+                                const newMsgs = [...prev];
+                                newMsgs[newMsgs.length - 1] = { role: 'model', content: streamed, isThinking: false, thinkingSteps: [...thinkingSteps] };
                                 return newMsgs;
                             });
                         } else if (data.type === 'answer') {
+                            streamed = data.content;
                             setMessages(prev => {
                                 const newMsgs = [...prev];
                                 newMsgs[newMsgs.length - 1] = { role: 'model', content: data.content, isThinking: false, thinkingSteps: [...thinkingSteps] };